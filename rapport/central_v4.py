@@ -229,6 +229,7 @@ class PageProcessorV4:
                             self.components["si_notifier"].notify(title, si_decision)
             
             # ✅ ACTIONS NON-SI
+            scan = None
             if not is_si:
                 # Typo (V4 sécurisé)
                 if ENABLE_TYPO_AUTO:
@@ -237,21 +238,28 @@ class PageProcessorV4:
                         self.stats["typo_fixed"] += 1
                         text = page.text
                 
+                # Analyse unique du texte, réutilisée par maintenance, ébauche
+                # et logs (les bandeaux ajoutés ne changent pas le résultat)
+                scan = self.components["maintenance"].scan(text)
+                
                 # Maintenance
                 if ENABLE_MAINTENANCE_AUTO:
-                    if self._add_maintenance(page, text):
+                    if self._add_maintenance(page, text, scan):
                         actions.append("maintenance")
                         self.stats["maintenance_added"] += 1
                         text = page.text
                 
                 # 🚨 BUG FIX 3: Ébauche V4 avec portails et IA
-                if self._add_stub_intelligent(page, text, result):
+                if self._add_stub_intelligent(page, text, result, scan):
                     actions.append("ébauche")
                     self.stats["stub_added"] += 1
             
             # Logs structurés
             if STRUCTURED_LOGS_ENABLED and (actions or result):
-                problems = self.components["maintenance"].detect_problems(text)
+                if scan is not None:
+                    problems = scan.problems
+                else:
+                    problems = self.components["maintenance"].detect_problems(text)
                 result_data = result if result else self.components["ia"]._get_fallback_response()
                 self.components["structured_logger"].log_event(
                     script="rapport",
@@ -331,13 +339,16 @@ class PageProcessorV4:
             logger.error(f"→ Erreur typo: {e}")
             return False
     
-    def _add_maintenance(self, page, text):
+    def _add_maintenance(self, page, text, scan=None):
         """Ajoute maintenance"""
         if DRY_RUN:
             return False
         
         try:
-            problems = self.components["maintenance"].detect_problems(text)
+            if scan is not None:
+                problems = scan.problems
+            else:
+                problems = self.components["maintenance"].detect_problems(text)
             if not problems:
                 return False
             
@@ -348,7 +359,9 @@ class PageProcessorV4:
             
             if self.components["maintenance"].needs_maintenance_template(text, problems):
                 new_text = self.components["maintenance"].add_maintenance_template(text, problems)
-                summary = self.components["maintenance"].get_maintenance_summary(problems)
+                summary = self.components["maintenance"].get_maintenance_summary(
+                    scan.problem_mask if scan is not None else problems
+                )
                 page.text = new_text
                 page.save(summary)
                 self.edit_count += 1
@@ -359,7 +372,7 @@ class PageProcessorV4:
             logger.error(f"→ Erreur maintenance: {e}")
             return False
     
-    def _add_stub_intelligent(self, page, text, ia_result):
+    def _add_stub_intelligent(self, page, text, ia_result, scan=None):
         """🚨 BUG FIX 3: Ébauche V4 avec portails et IA"""
         if DRY_RUN:
             return False
@@ -367,7 +380,7 @@ class PageProcessorV4:
         try:
             # Décision intelligente
             needs_stub, portals, reason = self.components["maintenance"].needs_stub_template(
-                text, ia_result
+                text, ia_result, scan
             )
             
             if not needs_stub:
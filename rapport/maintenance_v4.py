@@ -6,11 +6,102 @@ Module maintenance V4 avec gestion ébauche intelligente par portails
 
 import re
 import logging
+import functools
 from datetime import datetime, timezone
 from typing import List, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+# Les noms de modèles MediaWiki ne sont insensibles à la casse que sur la
+# première lettre : on énumère ses casses au lieu de re.I. Les préfixes
+# d'espace de noms ([[FICHIER:, [[CATÉGORIE:) et les balises (<REF>) sont
+# entièrement insensibles à la casse et gardent re.I (comme le paramètre
+# image, pour ne pas changer la détection)
+
+# Bandeau ébauche (Ébauche / ébauche)
+_STUB_TEMPLATE_RE = re.compile(r"\{\{\s*[Éé]bauche\b")
+
+# Modèles de travaux en cours
+_WORK_TEMPLATE_RE = re.compile(
+    r"\{\{\s*([Tt]ravaux|[Ee]n travaux|[Mm]ulti-travaux|[Ee]n cours)\b"
+)
+
+# Détection des problèmes de maintenance
+_CATEGORY_RE = re.compile(r"\[\[\s*catégorie\s*:", re.I)
+_AUTO_CAT_TEMPLATE_RE = re.compile(r"\{\{\s*(?:[Ii]nfobox|[Pp]alette|[Pp]ortail)\b")
+_PORTAL_TEMPLATE_RE = re.compile(r"\{\{\s*[Pp]ortail")
+_IMAGE_LINK_RE = re.compile(r"\[\[\s*(?:fichier|image|file)\s*:", re.I)
+_IMAGE_PARAM_RE = re.compile(r"\|\s*image\s*=", re.I)
+_REFERENCES_RE = re.compile(r"(?i:<ref)|\{\{\s*[Rr]éférences")
+_INTERNAL_LINK_RE = re.compile(
+    r"\[\[(?!catégorie:|fichier:|image:|file:)[^\]|]+", re.I
+)
+
+# Jetons du compteur de mots : modèles, liens, séparateurs et mots
+_WORD_TOKEN_RE = re.compile(r"\{\{|\}\}|\[\[|\]\]|\||\w+")
+_WORD_RE = re.compile(r"\w+")
+
+# Problèmes de maintenance, représentés en interne par un masque de bits
+PROBLEM_CATEGORIZE = 1 << 0
+PROBLEM_PORTAL = 1 << 1
+PROBLEM_ILLUSTRATE = 1 << 2
+PROBLEM_SOURCE = 1 << 3
+PROBLEM_WIKIFY = 1 << 4
+
+_PROBLEM_NAMES = ("catégoriser", "portail", "illustrer", "sourcer", "wikifier")
+
+# Listes de noms et résumés précalculés pour les 32 combinaisons possibles
+_PROBLEMS_BY_MASK = tuple(
+    tuple(name for bit, name in enumerate(_PROBLEM_NAMES) if mask & (1 << bit))
+    for mask in range(1 << len(_PROBLEM_NAMES))
+)
+_SUMMARY_BY_MASK = tuple(
+    f"Ajout maintenance : {', '.join(names)}" for names in _PROBLEMS_BY_MASK
+)
+
+# Bandeaux portail et ébauche
+_PORTAL_RE = re.compile(r'\{\{\s*[Pp]ortail\s*\|([^}]+)\}\}')
+_STUB_PORTALS_RE = re.compile(r'\{\{\s*[Éé]bauche\s*(?:\|([^}]+))?\}\}')
+
+
+@functools.lru_cache(maxsize=256)
+def _render_stub(portals: Tuple[str, ...]) -> str:
+    """Bandeau ébauche pour une liste de portails (mis en cache)"""
+    if portals:
+        # Nettoyer portails (enlever espaces, capitaliser)
+        clean_portals = [p.strip().capitalize() for p in portals if p.strip()]
+        portals_str = "|".join(clean_portals)
+        return f"{{{{Ébauche|{portals_str}}}}}\n"
+    return "{{Ébauche}}\n"
+
+
+@functools.lru_cache(maxsize=256)
+def _render_maintenance(problems: Tuple[str, ...], date: str) -> str:
+    """Bandeau maintenance pour une liste de problèmes (mis en cache)"""
+    jobs = ','.join(problems)
+    return f"{{{{Maintenance|job={jobs}|date={date}}}}}\n"
+
+
+class ScanResult:
+    """Résultat de l'analyse d'un article, partagé entre les étapes"""
+    
+    def __init__(
+        self,
+        problem_mask: int,
+        existing_portals: List[str],
+        word_count: Optional[int] = None
+    ):
+        """
+        Args:
+            problem_mask: Masque des problèmes de maintenance (PROBLEM_*)
+            existing_portals: Portails du bandeau {{Portail}}
+            word_count: Nombre de mots (None si non calculé)
+        """
+        self.problem_mask = problem_mask
+        self.problems = list(_PROBLEMS_BY_MASK[problem_mask])
+        self.existing_portals = existing_portals
+        self.word_count = word_count
+
 
 class MaintenanceDetectorV4:
     """Détecteur avec gestion ébauche par portails"""
@@ -30,23 +121,56 @@ class MaintenanceDetectorV4:
         Returns:
             True si en travaux (ne pas analyser)
         """
-        work_templates = ["Travaux", "En travaux", "multi-travaux", "En cours"]
-        
-        for template in work_templates:
-            if self.has_template(text, template):
-                logger.info(f"Page en travaux détectée: {{{{{{template}}}}}}")
-                return True
+        match = _WORK_TEMPLATE_RE.search(text)
+        if match:
+            logger.info(f"Page en travaux détectée: {{{{{match.group(1)}}}}}")
+            return True
         
         return False
     
     def word_count(self, text: str) -> int:
-        """Compte les mots (hors modèles et liens)"""
-        # Retirer modèles
-        text = re.sub(r'\{\{[^\}]*\}\}', '', text)
-        # Retirer liens mais garder texte
-        text = re.sub(r'\[\[[^\]|]*\|([^\]]*)\]\]', r'\1', text)
-        text = re.sub(r'\[\[([^\]]*)\]\]', r'\1', text)
-        return len(re.findall(r'\w+', text))
+        """
+        Compte les mots (hors modèles et liens)
+        
+        Parcours linéaire des jetons : les modèles imbriqués sont ignorés
+        grâce à un compteur de profondeur, et seul le texte affiché d'un
+        lien (après le dernier |) est compté.
+        """
+        # Texte sans modèle ni lien : comptage direct, sans boucle Python
+        if "{{" not in text and "[[" not in text:
+            return len(_WORD_RE.findall(text))
+        
+        count = 0
+        depth = 0
+        in_link = False
+        link_words = 0
+        
+        for token in _WORD_TOKEN_RE.findall(text):
+            if token == "{{":
+                depth += 1
+            elif token == "}}":
+                if depth:
+                    depth -= 1
+            elif depth:
+                continue
+            elif token == "[[":
+                in_link = True
+                link_words = 0
+            elif token == "]]":
+                if in_link:
+                    count += link_words
+                    in_link = False
+            elif token == "|":
+                link_words = 0
+            elif in_link:
+                link_words += 1
+            else:
+                count += 1
+        
+        if in_link:
+            count += link_words
+        
+        return count
     
     def extract_existing_portals(self, text: str) -> List[str]:
         """
@@ -58,12 +182,8 @@ class MaintenanceDetectorV4:
         portals = []
         
         # Chercher {{Portail|...}}
-        portal_pattern = r'\{\{\s*Portail\s*\|([^}]+)\}\}'
-        matches = re.finditer(portal_pattern, text, re.I)
-        
-        for match in matches:
+        for content in _PORTAL_RE.findall(text):
             # Extraire les portails séparés par |
-            content = match.group(1)
             portal_list = [p.strip() for p in content.split('|')]
             portals.extend(portal_list)
         
@@ -80,57 +200,77 @@ class MaintenanceDetectorV4:
         portals = []
         
         # Chercher {{Ébauche|...}} ou {{ébauche|...}}
-        stub_pattern = r'\{\{\s*[Éé]bauche\s*(?:\|([^}]+))?\}\}'
-        matches = re.finditer(stub_pattern, text, re.I)
-        
-        for match in matches:
-            if match.group(1):  # Y a des portails
-                content = match.group(1)
+        for content in _STUB_PORTALS_RE.findall(text):
+            if content:  # Y a des portails
                 portal_list = [p.strip() for p in content.split('|')]
                 portals.extend(portal_list)
         
         logger.debug(f"Portails ébauche existants: {portals}")
         return portals
     
+    def scan(self, text: str) -> ScanResult:
+        """
+        Détecte les problèmes et extrait les portails d'un article
+        
+        Le résultat peut être passé à needs_stub_template pour éviter
+        de ré-extraire les portails et de recompter les mots.
+        
+        Returns:
+            ScanResult
+        """
+        problem_mask, word_count = self._detect_problems(text)
+        return ScanResult(
+            problem_mask,
+            self.extract_existing_portals(text),
+            word_count
+        )
+    
     def detect_problems(self, text: str) -> List[str]:
         """Détecte les problèmes de maintenance"""
-        problems = []
+        return list(_PROBLEMS_BY_MASK[self._detect_problems(text)[0]])
+    
+    def _detect_problems(self, text: str) -> Tuple[int, Optional[int]]:
+        """
+        Détecte les problèmes de maintenance
+        
+        Returns:
+            (masque PROBLEM_*, nombre de mots ou None s'il n'a pas été calculé)
+        """
+        flags = 0
+        word_count = None
         
         # Catégorisation
-        if not re.search(r"\[\[\s*Catégorie\s*:", text, re.I):
-            auto_cat_templates = ["Infobox", "Palette", "Portail"]
-            has_auto_cat = any(self.has_template(text, t) for t in auto_cat_templates)
-            if not has_auto_cat:
-                problems.append("catégoriser")
+        if not _CATEGORY_RE.search(text):
+            if not _AUTO_CAT_TEMPLATE_RE.search(text):
+                flags |= PROBLEM_CATEGORIZE
         
         # Portail
-        if not re.search(r"\{\{\s*[Pp]ortail", text):
-            problems.append("portail")
+        if not _PORTAL_TEMPLATE_RE.search(text):
+            flags |= PROBLEM_PORTAL
         
         # Illustration
-        if not re.search(r"\[\[\s*(Fichier|Image)\s*:", text, re.I):
-            if not re.search(r"\|\s*image\s*=", text, re.I):
-                problems.append("illustrer")
+        if not _IMAGE_LINK_RE.search(text):
+            if not _IMAGE_PARAM_RE.search(text):
+                flags |= PROBLEM_ILLUSTRATE
         
         # Sources
-        if not re.search(r"<ref|{{\s*Références", text, re.I):
-            if self.word_count(text) > 100:
-                problems.append("sourcer")
+        if not _REFERENCES_RE.search(text):
+            word_count = self.word_count(text)
+            if word_count > 100:
+                flags |= PROBLEM_SOURCE
         
         # Wikification
-        internal_links = re.findall(
-            r"\[\[(?!Catégorie:|Fichier:|Image:|File:)[^\]|]+",
-            text, re.I
-        )
+        internal_links = _INTERNAL_LINK_RE.findall(text)
         if len(internal_links) < 3:
-            problems.append("wikifier")
+            flags |= PROBLEM_WIKIFY
         
-        return problems
+        return flags, word_count
     
     def needs_stub_template(
         self,
         text: str,
-        ia_result: Optional[dict] = None
+        ia_result: Optional[dict] = None,
+        scan: Optional[ScanResult] = None
     ) -> Tuple[bool, List[str], str]:
         """
         Décision intelligente pour ébauche
@@ -138,17 +278,20 @@ class MaintenanceDetectorV4:
         Args:
             text: Texte de l'article
             ia_result: Résultat analyse IA (avec needs_stub, portails)
+            scan: Résultat de scan() déjà calculé (optionnel)
             
         Returns:
             (needs_stub, portals, reason)
         """
         # Si déjà une ébauche, pas besoin d'en ajouter
-        if self.has_template(text, "Ébauche") or self.has_template(text, "ébauche"):
+        if _STUB_TEMPLATE_RE.search(text):
             return False, [], "Ébauche déjà présente"
         
-        word_count = self.word_count(text)
-        
         # Critère 1 : Nombre de mots
+        if scan is not None and scan.word_count is not None:
+            word_count = scan.word_count
+        else:
+            word_count = self.word_count(text)
         words_suggest_stub = word_count < self.min_words_stub
         
         # Critère 2 : Avis IA (si disponible)
@@ -194,7 +337,10 @@ class MaintenanceDetectorV4:
                 portals = ia_portals[:3]  # Max 3
             else:
                 # Fallback : extraire des portails existants
-                existing_portals = self.extract_existing_portals(text)
+                if scan is not None:
+                    existing_portals = scan.existing_portals
+                else:
+                    existing_portals = self.extract_existing_portals(text)
                 if existing_portals:
                     portals = existing_portals[:3]
         
@@ -215,15 +361,7 @@ class MaintenanceDetectorV4:
         Returns:
             Texte avec bandeau
         """
-        if portals and len(portals) > 0:
-            # Nettoyer portails (enlever espaces, capitaliser)
-            clean_portals = [p.strip().capitalize() for p in portals if p.strip()]
-            portals_str = "|".join(clean_portals)
-            stub = f"{{{{Ébauche|{portals_str}}}}}"
-        else:
-            stub = "{{Ébauche}}"
-        
-        return stub + "\n" + text
+        return _render_stub(tuple(portals or ())) + text
     
     def needs_maintenance_template(self, text: str, problems: List[str]) -> bool:
         """Vérifie si maintenance nécessaire"""
@@ -236,12 +374,17 @@ class MaintenanceDetectorV4:
     def add_maintenance_template(self, text: str, problems: List[str]) -> str:
         """Ajoute bandeau maintenance"""
         date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-        jobs = ','.join(problems)
-        template = f"{{{{Maintenance|job={jobs}|date={date}}}}}\n"
-        return template + text
+        return _render_maintenance(tuple(problems), date) + text
     
-    def get_maintenance_summary(self, problems: List[str]) -> str:
-        """Résumé maintenance"""
+    def get_maintenance_summary(self, problems) -> str:
+        """
+        Résumé maintenance
+        
+        Args:
+            problems: Liste des problèmes ou masque PROBLEM_* (ScanResult)
+        """
+        if isinstance(problems, int):
+            return _SUMMARY_BY_MASK[problems]
         return f"Ajout maintenance : {', '.join(problems)}"
     
     def get_stub_summary(self, portals: List[str] = None) -> str:
@@ -4,13 +4,25 @@
 Module de reporting (Discord, logs, wiki)
 """
 
+import asyncio
 import logging
+import re
+import string
 import urllib.parse
 from datetime import datetime, timezone
 import requests
 
 logger = logging.getLogger(__name__)
 
+# Caractères laissés tels quels par urllib.parse.quote (safe="/")
+_URL_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + "_.-~/")
+
+# Taille maximale conservée de l'historique de la page de logs (caractères)
+MAX_LOG_CHARS = 200_000
+
+# Début d'un résumé sur la page de logs ({{Utilisateur:<bot>/Resume en début de ligne)
+_RESUME_START_RE = re.compile(r"^\{\{Utilisateur:[^|\n]*/Resume", re.MULTILINE)
+
 
 class DiscordReporter:
     """Gère les notifications Discord"""
@@ -138,17 +150,95 @@ class DiscordReporter:
         return self.send_embed(embed)
 
 
+class DiscordReporterAsync:
+    """
+    Notifications Discord vers plusieurs webhooks en parallèle
+    
+    Nécessite httpx (avec h2 pour HTTP/2), importé uniquement à l'envoi.
+    DiscordReporter reste la version synchrone à un seul webhook.
+    """
+    
+    def __init__(self, webhook_urls, timeout=10):
+        """
+        Args:
+            webhook_urls: URL ou liste d'URL de webhooks Discord
+            timeout: Timeout des requêtes en secondes
+        """
+        if isinstance(webhook_urls, str):
+            webhook_urls = [webhook_urls]
+        self.webhook_urls = [url for url in (webhook_urls or []) if url]
+        self.timeout = timeout
+    
+    async def send_embed(self, embed, mentions=""):
+        """
+        Envoie un embed Discord à tous les webhooks
+        
+        Args:
+            embed: Dictionnaire de l'embed
+            mentions: Mentions utilisateurs (optionnel)
+            
+        Returns:
+            bool: True si tous les envois ont réussi
+        """
+        if not self.webhook_urls:
+            logger.warning("Webhook Discord non configuré")
+            return False
+        
+        import httpx
+        
+        payload = {
+            "content": mentions,
+            "embeds": [embed]
+        }
+        
+        async with httpx.AsyncClient(http2=True, timeout=self.timeout) as client:
+            responses = await asyncio.gather(
+                *[client.post(url, json=payload) for url in self.webhook_urls],
+                return_exceptions=True
+            )
+        
+        success = True
+        for response in responses:
+            if isinstance(response, httpx.TimeoutException):
+                logger.error("Timeout webhook Discord")
+                success = False
+            elif isinstance(response, Exception):
+                logger.error(f"Erreur webhook Discord: {response}")
+                success = False
+            elif response.is_error:
+                logger.error(f"Erreur webhook Discord: HTTP {response.status_code}")
+                success = False
+        
+        if success:
+            logger.debug(
+                f"Embed Discord envoyé à {len(responses)} webhook(s): "
+                f"{embed.get('title', 'Sans titre')}"
+            )
+        return success
+    
+    def send_embed_sync(self, embed, mentions=""):
+        """
+        Version synchrone de send_embed (hors boucle asyncio)
+        
+        Returns:
+            bool: True si tous les envois ont réussi
+        """
+        return asyncio.run(self.send_embed(embed, mentions))
+
+
 class WikiLogger:
     """Gère les logs sur une page wiki"""
     
-    def __init__(self, site, log_page_title):
+    def __init__(self, site, log_page_title, max_log_chars=MAX_LOG_CHARS):
         """
         Args:
             site: Site pywikibot
             log_page_title: Titre de la page de logs
+            max_log_chars: Historique conservé en caractères (None = illimité)
         """
         self.site = site
         self.log_page_title = log_page_title
+        self.max_log_chars = max_log_chars
         self.entries = []
     
     def add_entry(self, title, result, actions, is_si=False):
@@ -161,20 +251,48 @@ class WikiLogger:
             actions: Liste des actions
             is_si: Si un SI a été ajouté
         """
+        # Champs bruts uniquement, le wikitexte est généré dans save_to_wiki
         entry = (
-            f"* '''{title}'''\n"
-            f"  * SI : {'Oui' if is_si else 'Non'}\n"
-            f"  * Vandalisme : {result['vandalisme']}\n"
-            f"  * Langue FR : {result['langue_fr']}\n"
-            f"  * Autopromo : {result['autopromo']}\n"
-            f"  * Qualité : {result['qualite']}\n"
-            f"  * Confiance : {result['confiance']}/100\n"
-            f"  * Actions : {', '.join(actions) if actions else 'Aucune'}\n"
-            f"  * Justification : {result['justification']}"
+            title,
+            (
+                result['vandalisme'],
+                result['langue_fr'],
+                result['autopromo'],
+                result['qualite'],
+                result['confiance'],
+                result['justification'],
+            ),
+            tuple(actions) if actions else (),
+            is_si,
         )
         self.entries.append(entry)
         logger.debug(f"Entrée log ajoutée pour: {title}")
     
+    @staticmethod
+    def _render_entry(entry):
+        """
+        Génère les lignes wikitexte d'une entrée de log
+        
+        Args:
+            entry: Tuple (titre, champs du résultat, actions, is_si)
+        
+        Returns:
+            list: Lignes de l'entrée
+        """
+        title, fields, actions, is_si = entry
+        vandalisme, langue_fr, autopromo, qualite, confiance, justification = fields
+        return [
+            f"* '''{title}'''",
+            f"  * SI : {'Oui' if is_si else 'Non'}",
+            f"  * Vandalisme : {vandalisme}",
+            f"  * Langue FR : {langue_fr}",
+            f"  * Autopromo : {autopromo}",
+            f"  * Qualité : {qualite}",
+            f"  * Confiance : {confiance}/100",
+            f"  * Actions : {', '.join(actions) if actions else 'Aucune'}",
+            f"  * Justification : {justification}",
+        ]
+    
     def save_to_wiki(self, bot_name, duration, start_time=None):
         """
         Sauvegarde les logs sur la page wiki
@@ -197,12 +315,19 @@ class WikiLogger:
             
             # Récupérer le contenu existant
             old_text = log_page.text if log_page.exists() else ""
+            old_text = self._trim_history(old_text)
             
             # Préparer le nouveau résumé
             now = start_time or datetime.now(timezone.utc)
             date_str = now.strftime("%d/%m/%Y")
             heure_str = now.strftime("%H:%M:%S")
             
+            lines = [
+                line
+                for entry in self.entries
+                for line in self._render_entry(entry)
+            ]
+            
             resume = f"""{{{{Utilisateur:{bot_name}/Resume
 | script = rapport
 | date = {date_str}
@@ -210,11 +335,11 @@ class WikiLogger:
 | durée = {duration}s
 | modifs = {len(self.entries)}
 | autres =
-{chr(10).join(self.entries)}
+{chr(10).join(lines)}
 }}}}"""
             
             # Ajouter le nouveau résumé
-            log_page.text = old_text.rstrip() + "\n\n" + resume
+            log_page.text = "".join((old_text.rstrip(), "\n\n", resume))
             log_page.save(f"📝 {bot_name} : rapport IA", minor=True)
             
             logger.info(f"Logs sauvegardés sur {self.log_page_title} ({len(self.entries)} entrées)")
@@ -224,6 +349,39 @@ class WikiLogger:
             logger.error(f"Erreur sauvegarde logs wiki: {e}")
             return False
     
+    def _trim_history(self, old_text):
+        """
+        Limite la taille de l'historique de la page de logs
+        
+        Ne garde que les résumés complets contenus dans les derniers
+        max_log_chars caractères : la coupe se fait au début d'un résumé,
+        jamais au milieu. L'en-tête de la page (avant le premier résumé) est
+        conservé.
+        
+        Args:
+            old_text: Contenu existant de la page
+            
+        Returns:
+            str: Historique conservé
+        """
+        if not self.max_log_chars or len(old_text) <= self.max_log_chars:
+            return old_text
+        
+        first = _RESUME_START_RE.search(old_text)
+        if first is None:
+            return old_text
+        
+        header = old_text[:first.start()]
+        resume = _RESUME_START_RE.search(
+            old_text, max(first.start(), len(old_text) - self.max_log_chars + len(header))
+        )
+        if resume is None:
+            logger.info("Historique des logs tronqué à l'en-tête de la page")
+            return header
+        
+        logger.info(f"Historique des logs tronqué à {len(old_text) - resume.start()} caractères")
+        return header + old_text[resume.start():]
+    
     def clear(self):
         """Efface les entrées en mémoire"""
         self.entries.clear()
@@ -240,7 +398,12 @@ def format_wiki_url(title, base_url="https://fr.vikidia.org/wiki/"):
     Returns:
         str: URL complète
     """
-    encoded_title = urllib.parse.quote(title.replace(' ', '_'))
+    path = title.replace(' ', '_')
+    if _URL_SAFE_CHARS.issuperset(path):
+        # Titre ASCII sans caractère à encoder : rien à faire
+        encoded_title = path
+    else:
+        encoded_title = urllib.parse.quote_from_bytes(path.encode('utf-8'))
     return f"{base_url}{encoded_title}"
 
 
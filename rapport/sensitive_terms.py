@@ -7,12 +7,99 @@ Module de détection de termes sensibles pour SI immédiate
 import re
 import json
 import logging
+import functools
+import string
 from typing import Dict, List, Set, Optional, Tuple
 from pathlib import Path
+from collections import Counter, defaultdict
+from itertools import chain, islice
 from unicodedata import normalize
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick optionnel
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:  # google-re2 optionnel
+    re2 = None
+
+try:
+    import hyperscan
+except ImportError:  # hyperscan optionnel (detect_batch)
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
+# Options RE2 : insensible à la casse, erreurs de compilation non loggées
+if re2 is not None:
+    _RE2_OPTIONS = re2.Options()
+    _RE2_OPTIONS.case_sensitive = False
+    _RE2_OPTIONS.log_errors = False
+
+# Nombre de textes dont le résultat de détection est gardé en mémoire
+DETECT_CACHE_SIZE = 256
+
+# Terme littéral de la forme \bmot\b (éligible à l'automate Aho-Corasick)
+_LITERAL_TERM_RE = re.compile(r"^\\b(\w+)\\b$")
+
+
+# Substitutions de contournement courantes (leet speak), en une table
+_LEET_TRANSLATION = str.maketrans({
+    '0': 'o',
+    '1': 'i',
+    '3': 'e',
+    '4': 'a',
+    '5': 's',
+    '7': 't',
+    '@': 'a',
+    '$': 's',
+    '€': 'e'
+})
+
+# Texte ASCII : minuscules + leet speak en une passe sur les octets
+_ASCII_TRANSLATION = bytes.maketrans(
+    string.ascii_uppercase.encode() + b"013457@$",
+    string.ascii_lowercase.encode() + b"oieastas"
+)
+
+# Diacritiques combinants, supprimés après décomposition NFKD
+_COMBINING_MARKS = dict.fromkeys(range(0x300, 0x370))
+
+
+# Lettres accentuées -> lettre de base, caractère pour caractère : contrairement
+# à NFKD, la longueur du texte (et donc les positions) est conservée
+_ACCENT_FOLD = {}
+for _code in chain(range(0xC0, 0x250), range(0x1E00, 0x1F00)):
+    _base = normalize('NFD', chr(_code))[0]
+    if _base != chr(_code):
+        _ACCENT_FOLD[_code] = _base
+del _code, _base
+
+# Indices de contournement justifiant la normalisation complète : chiffre ou
+# symbole collé à une lettre, séparateurs répétés, diacritiques combinants
+_OBFUSCATION_HINT_RE = re.compile(
+    r"[^\W\d_][013457@$€]|[013457@$€][^\W\d_]|[_\-\*\+\.]{2,}|[\u0300-\u036f]"
+)
+
+
+def _needs_normalization(text: str) -> bool:
+    """Indice de contournement, ou caractères de compatibilité (pleine chasse, mathématiques...)"""
+    if _OBFUSCATION_HINT_RE.search(text):
+        return True
+    return not text.isascii() and normalize('NFKC', text) != text
+
+
+def _strip_accents(text: str) -> str:
+    """Décompose (NFKD) puis supprime les accents"""
+    return normalize('NFKD', text).translate(_COMBINING_MARKS)
+
+
+def _is_word_char(char: str) -> bool:
+    """Équivalent de \\w pour un caractère (frontière de mot \\b)"""
+    return char.isalnum() or char == "_"
+
 
 class SensitiveCategory:
     """Catégorie de termes sensibles"""
@@ -68,6 +155,29 @@ class SensitiveTermsDetector:
         self.terms: Dict[str, List[Dict]] = {}
         self.exclusions: Set[str] = set()
         self.excluded_categories: Set[str] = set()
+        # Second passage sur le texte normalisé (leet speak, séparateurs)
+        self.normalization_enabled = True
+        # Exclusions de titre déjà en minuscules (pour _should_exclude)
+        self._exclusions_lc: frozenset = frozenset()
+        # Patterns compilés : (regex, catégorie, gravité), figés après chargement
+        self._compiled: Tuple[Tuple[re.Pattern, str, int], ...] = ()
+        # Automate Aho-Corasick des termes littéraux (si pyahocorasick)
+        self._automaton = None
+        # Alternation unique des termes sans groupe + termes restants
+        self._fused: Optional[re.Pattern] = None
+        # Variante RE2 pour les textes ASCII (si google-re2) + termes non RE2
+        self._fused_re2 = None
+        self._fused_rest: Optional[re.Pattern] = None
+        self._re2_terms: List[int] = []
+        self._re2_rest_terms: List[int] = []
+        # Base Hyperscan pour detect_batch + termes qu'elle ne gère pas
+        self._hs_db = None
+        self._hs_rest_terms: List[int] = []
+        self._fused_terms: List[int] = []
+        self._separate_terms: List[int] = []
+        # Incrémenté à chaque changement des termes (invalide le cache)
+        self._config_version = 0
+        self._scan_cached = functools.lru_cache(maxsize=DETECT_CACHE_SIZE)(self._scan)
         
         # Charger la configuration
         self._load_config()
@@ -92,7 +202,10 @@ class SensitiveTermsDetector:
             
             self.terms = config.get("terms", {})
             self.exclusions = set(config.get("exclusions", []))
+            self._exclusions_lc = frozenset(e.lower() for e in self.exclusions)
             self.excluded_categories = set(config.get("excluded_categories", []))
+            self.normalization_enabled = bool(config.get("normalization", True))
+            self._compile_terms()
             
             logger.info(f"Config chargée: {sum(len(t) for t in self.terms.values())} termes")
             
@@ -137,7 +250,8 @@ class SensitiveTermsDetector:
                 "Liste des",
                 "Catégorie:"
             ],
-            "excluded_categories": []
+            "excluded_categories": [],
+            "normalization": True
         }
         
         try:
@@ -146,9 +260,168 @@ class SensitiveTermsDetector:
             logger.info(f"Config par défaut créée: {self.config_file}")
             self.terms = default_config["terms"]
             self.exclusions = set(default_config["exclusions"])
+            self._exclusions_lc = frozenset(e.lower() for e in self.exclusions)
+            self._compile_terms()
         except Exception as e:
             logger.error(f"Erreur création config par défaut: {e}")
     
+    def _compile_term(self, category: str, term_data: Dict) -> Optional[Tuple[re.Pattern, str, int]]:
+        """
+        Compile un terme de la configuration
+        
+        Returns:
+            (regex, catégorie, gravité) ou None si le terme est invalide
+        """
+        # Le texte analysé est sans accents : le pattern doit l'être aussi
+        pattern = _strip_accents(term_data.get("pattern", ""))
+        try:
+            severity = int(term_data.get("severity", 1))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Gravité invalide, terme ignoré ({category}): {pattern} - {e}")
+            return None
+        try:
+            return re.compile(pattern, re.IGNORECASE), category, severity
+        except re.error as e:
+            logger.error(f"Pattern invalide ignoré ({category}): {pattern} - {e}")
+            return None
+    
+    def _compile_terms(self):
+        """Compile une fois pour toutes les patterns de self.terms"""
+        compiled_terms = []
+        for category, term_list in self.terms.items():
+            for term_data in term_list:
+                compiled = self._compile_term(category, term_data)
+                if compiled:
+                    compiled_terms.append(compiled)
+        self._compiled = tuple(compiled_terms)
+        self._build_fused()
+    
+    def _build_fused(self):
+        """
+        Fusionne les termes en une seule regex
+        
+        Un seul parcours du texte suffit à écarter les textes sans aucun de
+        ces termes (cas le plus courant). Une alternation ne rend pas les
+        matches qui se chevauchent : si elle trouve quelque chose, chaque
+        terme est recherché à partir de ce premier match. Les termes ayant
+        leurs propres groupes (références arrière possibles) restent
+        recherchés séparément.
+        
+        Si pyahocorasick est installé, les termes littéraux (\\bmot\\b) passent
+        par un automate Aho-Corasick, linéaire quelle que soit leur quantité.
+        """
+        self._config_version += 1
+        self._automaton = None
+        self._fused = None
+        self._fused_re2 = None
+        self._fused_rest = None
+        self._re2_terms = []
+        self._re2_rest_terms = []
+        self._build_hyperscan()
+        self._fused_terms = []
+        self._separate_terms = []
+        
+        literals: Dict[str, List[int]] = {}
+        for index, (regex, _, _) in enumerate(self._compiled):
+            literal = _LITERAL_TERM_RE.match(regex.pattern) if ahocorasick else None
+            if literal:
+                literals.setdefault(literal.group(1).lower(), []).append(index)
+            elif regex.groups:
+                self._separate_terms.append(index)
+            else:
+                self._fused_terms.append(index)
+        
+        if literals:
+            self._automaton = ahocorasick.Automaton()
+            for literal, indexes in literals.items():
+                self._automaton.add_word(literal, (len(literal), tuple(indexes)))
+            self._automaton.make_automaton()
+        
+        if not self._fused_terms:
+            return
+        
+        try:
+            self._fused = re.compile(self._alternation(self._fused_terms), re.IGNORECASE)
+        except re.error as e:
+            logger.warning(f"Fusion des patterns impossible, recherche terme par terme: {e}")
+            self._separate_terms = sorted(self._separate_terms + self._fused_terms)
+            self._fused_terms = []
+            return
+        
+        self._build_fused_re2()
+    
+    def _alternation(self, indexes: List[int]) -> str:
+        """Alternation des patterns donnés"""
+        return "|".join(f"(?:{self._compiled[i][0].pattern})" for i in indexes)
+    
+    def _build_hyperscan(self):
+        """
+        Compile tous les termes dans une base Hyperscan (si installé)
+        
+        Hyperscan ne gère pas les assertions avant/arrière ni les références
+        arrière : ces termes sont recherchés avec leur regex Python.
+        """
+        self._hs_db = None
+        self._hs_rest_terms = []
+        if hyperscan is None:
+            return
+        
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST
+        expressions = []
+        ids = []
+        for index, (regex, _, _) in enumerate(self._compiled):
+            expression = regex.pattern.encode('utf-8')
+            try:
+                hyperscan.Database().compile(
+                    expressions=[expression], ids=[index], elements=1, flags=[flags]
+                )
+            except hyperscan.error:
+                self._hs_rest_terms.append(index)
+                continue
+            expressions.append(expression)
+            ids.append(index)
+        
+        if not expressions:
+            return
+        
+        self._hs_db = hyperscan.Database()
+        self._hs_db.compile(
+            expressions=expressions,
+            ids=ids,
+            elements=len(expressions),
+            flags=[flags] * len(expressions)
+        )
+    
+    def _build_fused_re2(self):
+        """
+        Compile l'alternation avec RE2 (temps linéaire garanti)
+        
+        RE2 ne gère ni assertions avant/arrière ni références arrière : ces
+        termes restent dans une petite regex Python. Ses \\b et \\w ne
+        connaissent que l'ASCII, la version RE2 n'est donc utilisée que sur
+        les textes ASCII (cas du premier passage, accents retirés).
+        """
+        if re2 is None:
+            return
+        
+        compatible = []
+        rest = []
+        for index in self._fused_terms:
+            try:
+                re2.compile(self._compiled[index][0].pattern, _RE2_OPTIONS)
+                compatible.append(index)
+            except re2.error:
+                rest.append(index)
+        
+        if not compatible:
+            return
+        
+        self._fused_re2 = re2.compile(self._alternation(compatible), _RE2_OPTIONS)
+        self._re2_terms = compatible
+        if rest:
+            self._fused_rest = re.compile(self._alternation(rest), re.IGNORECASE)
+            self._re2_rest_terms = rest
+    
     def _normalize_text(self, text: str) -> str:
         """
         Normalise le texte pour détection robuste
@@ -159,27 +432,18 @@ class SensitiveTermsDetector:
         Returns:
             Texte normalisé
         """
-        # Normalisation Unicode (supprimer accents variables)
-        text = normalize('NFKD', text)
-        
-        # Minuscules
-        text = text.lower()
-        
-        # Remplacer variations courantes
-        replacements = {
-            '0': 'o',
-            '1': 'i',
-            '3': 'e',
-            '4': 'a',
-            '5': 's',
-            '7': 't',
-            '@': 'a',
-            '$': 's',
-            '€': 'e'
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
+        if text.isascii():
+            # Pas d'accents : minuscules et variations en une passe sur les octets
+            text = text.encode('ascii').translate(_ASCII_TRANSLATION).decode('ascii')
+        else:
+            # Normalisation Unicode (supprimer accents variables)
+            text = _strip_accents(text)
+            
+            # Minuscules
+            text = text.lower()
+            
+            # Remplacer variations courantes (une seule passe)
+            text = text.translate(_LEET_TRANSLATION)
         
         # Supprimer caractères spéciaux ajoutés pour contourner filtres
         text = re.sub(r'[_\-\*\+\.]{2,}', '', text)
@@ -222,16 +486,15 @@ class SensitiveTermsDetector:
             bool: True si exclue
         """
         # Vérifier titre
-        for exclusion in self.exclusions:
-            if exclusion.lower() in title.lower():
-                self.stats["false_positives_avoided"] += 1
-                return True
+        title_lc = title.lower()
+        if any(exclusion in title_lc for exclusion in self._exclusions_lc):
+            self.stats["false_positives_avoided"] += 1
+            return True
         
         # Vérifier catégories
-        for category in categories:
-            if category in self.excluded_categories:
-                self.stats["false_positives_avoided"] += 1
-                return True
+        if categories and not self.excluded_categories.isdisjoint(categories):
+            self.stats["false_positives_avoided"] += 1
+            return True
         
         return False
     
@@ -261,35 +524,187 @@ class SensitiveTermsDetector:
         if self._should_exclude(title, categories or []):
             return [], 0
         
-        # Normaliser le texte
-        normalized = self._normalize_text(text)
+        # Même texte et mêmes termes : résultat en cache
+        matches, max_severity = self._scan_cached(self._config_version, text)
+        self.stats["matches"] += len(matches)
+        
+        return list(matches), max_severity
+    
+    def _scan(self, config_version: int, text: str) -> Tuple[Tuple[SensitiveMatch, ...], int]:
+        """
+        Recherche les termes dans le texte (sans exclusions ni statistiques)
+        
+        Premier passage sur une copie du texte de même longueur (accents
+        retirés caractère par caractère, minuscules) : les positions trouvées
+        indexent directement le texte original. La normalisation complète
+        (leet speak, séparateurs) n'est faite qu'en cas de contournement
+        suspecté (et si elle est activée dans la config), et seuls les termes supplémentaires qu'elle révèle sont
+        ajoutés, avec un contexte pris dans le texte normalisé.
         
+        Args:
+            config_version: Version des termes (clé du cache uniquement)
+            text: Texte à analyser
+            
+        Returns:
+            (matches, max_severity)
+        """
+        return self._collect(text, self._find_terms)
+    
+    def _collect(self, text: str, find_terms) -> Tuple[Tuple[SensitiveMatch, ...], int]:
+        """
+        Construit les matches d'un texte (voir _scan)
+        
+        Args:
+            text: Texte à analyser
+            find_terms: Fonction de recherche (_find_terms ou _find_terms_batch)
+            
+        Returns:
+            (matches, max_severity)
+        """
         matches = []
         max_severity = 0
         
-        # Parcourir toutes les catégories
-        for category, term_list in self.terms.items():
-            for term_data in term_list:
-                pattern = term_data.get("pattern", "")
-                severity = term_data.get("severity", 1)
-                
-                # Chercher les matches
-                for match in re.finditer(pattern, normalized, re.IGNORECASE):
-                    self.stats["matches"] += 1
-                    
-                    # Extraire contexte
-                    context = self._extract_context(text, match.start())
-                    
-                    matches.append(SensitiveMatch(
-                        term=match.group(0),
-                        category=category,
-                        severity=severity,
-                        context=context
-                    ))
-                    
-                    max_severity = max(max_severity, severity)
-        
-        return matches, max_severity
+        # (index du terme, passage, position, texte trouvé, texte source)
+        found = [
+            (index, 0, start, term, text)
+            for index, start, term in find_terms(text.translate(_ACCENT_FOLD).lower())
+        ]
+        
+        if self.normalization_enabled and _needs_normalization(text):
+            normalized = self._normalize_text(text)
+            already_found = Counter((index, term) for index, _, _, term, _ in found)
+            for index, start, term in find_terms(normalized):
+                if already_found[(index, term)]:
+                    already_found[(index, term)] -= 1
+                else:
+                    found.append((index, 1, start, term, normalized))
+        
+        # Ordre de la configuration (catégorie puis terme), comme avant la fusion
+        found.sort(key=lambda item: item[:3])
+        
+        for index, _, start, term, source in found:
+            _, category, severity = self._compiled[index]
+            
+            # Extraire contexte
+            context = self._extract_context(source, start)
+            
+            matches.append(SensitiveMatch(
+                term=term,
+                category=category,
+                severity=severity,
+                context=context
+            ))
+            
+            max_severity = max(max_severity, severity)
+        
+        return tuple(matches), max_severity
+    
+    def _find_terms(self, scan_text: str) -> List[Tuple[int, int, str]]:
+        """
+        Recherche tous les termes compilés dans un texte déjà préparé
+        
+        Returns:
+            Liste de (index du terme, position, texte trouvé)
+        """
+        found = []
+        
+        # Termes littéraux via l'automate
+        if self._automaton is not None:
+            length_text = len(scan_text)
+            for end, (length, indexes) in self._automaton.iter(scan_text):
+                start = end - length + 1
+                if start > 0 and _is_word_char(scan_text[start - 1]):
+                    continue
+                if end + 1 < length_text and _is_word_char(scan_text[end + 1]):
+                    continue
+                for index in indexes:
+                    found.append((index, start, scan_text[start:end + 1]))
+        
+        # Termes fusionnés : l'alternation (RE2 si texte ASCII) ne sert qu'à
+        # trouver le premier match, puis chaque terme est recherché depuis là
+        # pour garder les matches qui se chevauchent
+        if self._fused_re2 is not None and scan_text.isascii():
+            fused_passes = (
+                (self._fused_re2, self._re2_terms),
+                (self._fused_rest, self._re2_rest_terms),
+            )
+        else:
+            fused_passes = ((self._fused, self._fused_terms),)
+        
+        for fused, indexes in fused_passes:
+            if fused is None:
+                continue
+            first = fused.search(scan_text)
+            if first is None:
+                continue
+            for index in indexes:
+                for match in self._compiled[index][0].finditer(scan_text, first.start()):
+                    found.append((index, match.start(), match.group(0)))
+        
+        # Termes recherchés séparément
+        for index in self._separate_terms:
+            for match in self._compiled[index][0].finditer(scan_text):
+                found.append((index, match.start(), match.group(0)))
+        
+        return found
+    
+    def _find_terms_batch(self, scan_text: str) -> List[Tuple[int, int, str]]:
+        """
+        Comme _find_terms, mais avec la base Hyperscan si disponible
+        
+        Les positions Hyperscan sont en octets : la base n'est utilisée que
+        sur les textes ASCII, où elles coïncident avec les caractères.
+        """
+        if self._hs_db is None or not scan_text.isascii():
+            return self._find_terms(scan_text)
+        
+        # Plus longue fin par (terme, début) : Hyperscan signale chaque fin
+        ends: Dict[Tuple[int, int], int] = {}
+        
+        def on_match(index, start, end, flags, context):
+            key = (index, start)
+            if end > ends.get(key, -1):
+                ends[key] = end
+        
+        self._hs_db.scan(scan_text.encode('ascii'), match_event_handler=on_match)
+        
+        found = [
+            (index, start, scan_text[start:end])
+            for (index, start), end in ends.items()
+        ]
+        for index in self._hs_rest_terms:
+            for match in self._compiled[index][0].finditer(scan_text):
+                found.append((index, match.start(), match.group(0)))
+        
+        return found
+    
+    def detect_batch(self, texts: List[str]) -> List[Tuple[List[SensitiveMatch], int]]:
+        """
+        Détecte les termes sensibles sur un lot de textes
+        
+        Pour les analyses en masse (révisions, listes de pages) : avec
+        Hyperscan, tous les termes sont recherchés en un seul parcours de
+        chaque texte. Sans Hyperscan, équivaut à appeler detect() en boucle.
+        Pas d'exclusions par titre ni de cache.
+        
+        Args:
+            texts: Textes à analyser
+            
+        Returns:
+            Liste de (matches, max_severity), dans l'ordre des textes
+        """
+        results = []
+        for text in texts:
+            self.stats["checks"] += 1
+            if not text or not text.strip():
+                results.append(([], 0))
+                continue
+            
+            matches, max_severity = self._collect(text, self._find_terms_batch)
+            self.stats["matches"] += len(matches)
+            results.append((list(matches), max_severity))
+        
+        return results
     
     def should_add_si(
         self,
@@ -336,22 +751,36 @@ class SensitiveTermsDetector:
         if not matches:
             return "Aucun terme sensible détecté"
         
-        report_lines = [f"⚠️ {len(matches)} terme(s) sensible(s) détecté(s):"]
-        
         # Grouper par catégorie
-        by_category = {}
+        by_category = defaultdict(list)
         for match in matches:
-            if match.category not in by_category:
-                by_category[match.category] = []
             by_category[match.category].append(match)
         
-        for category, cat_matches in by_category.items():
-            report_lines.append(f"\n📌 {category.upper()} ({len(cat_matches)}):")
-            for match in cat_matches[:3]:  # Limiter à 3 par catégorie
-                report_lines.append(f"  - '{match.term}' (gravité {match.severity})")
-                report_lines.append(f"    Contexte: {match.context}")
+        return "\n".join(chain(
+            (f"⚠️ {len(matches)} terme(s) sensible(s) détecté(s):",),
+            (
+                line
+                for category, cat_matches in by_category.items()
+                for line in self._format_category(category, cat_matches)
+            )
+        ))
+    
+    @staticmethod
+    def _format_category(category: str, cat_matches: List[SensitiveMatch]):
+        """
+        Génère les lignes du rapport pour une catégorie
         
-        return "\n".join(report_lines)
+        Args:
+            category: Catégorie
+            cat_matches: Matches de la catégorie
+            
+        Returns:
+            Générateur de lignes
+        """
+        yield f"\n📌 {category.upper()} ({len(cat_matches)}):"
+        for match in islice(cat_matches, 3):  # Limiter à 3 par catégorie
+            yield f"  - '{match.term}' (gravité {match.severity})"
+            yield f"    Contexte: {match.context}"
     
     def add_term(
         self,
@@ -370,10 +799,16 @@ class SensitiveTermsDetector:
         if category not in self.terms:
             self.terms[category] = []
         
-        self.terms[category].append({
+        term_data = {
             "pattern": pattern,
             "severity": min(5, max(1, severity))
-        })
+        }
+        self.terms[category].append(term_data)
+        
+        compiled = self._compile_term(category, term_data)
+        if compiled:
+            self._compiled += (compiled,)
+            self._build_fused()
         
         # Sauvegarder
         self._save_config()
@@ -384,7 +819,8 @@ class SensitiveTermsDetector:
             config = {
                 "terms": self.terms,
                 "exclusions": list(self.exclusions),
-                "excluded_categories": list(self.excluded_categories)
+                "excluded_categories": list(self.excluded_categories),
+                "normalization": self.normalization_enabled
             }
             
             with open(self.config_file, 'w', encoding='utf-8') as f:
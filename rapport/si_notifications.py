@@ -5,15 +5,50 @@ Module de notifications dédiées pour les SI (Suppression Immédiate)
 """
 
 import time
+import asyncio
 import logging
+import threading
 import urllib.parse
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from enum import Enum
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# Nombre maximal de pages suivies pour le cooldown
+MAX_COOLDOWN_ENTRIES = 10_000
+
+# Notifications envoyées en parallèle par notify_batch / notify_batch_async
+BATCH_MAX_WORKERS = 8
+ASYNC_MAX_CONCURRENCY = 16
+
+# Dernier horodatage ISO généré : (seconde Unix, chaîne ISO)
+_ts_cache = (0, "")
+
+
+def _now_iso() -> str:
+    """
+    Horodatage UTC ISO 8601 à la seconde près
+    
+    Les décisions créées dans la même seconde partagent la même chaîne
+    (Discord n'affiche pas plus précis).
+    
+    Returns:
+        Horodatage ISO
+    """
+    global _ts_cache
+    second = int(time.time())
+    cached_second, cached_iso = _ts_cache
+    if second != cached_second:
+        cached_iso = datetime.fromtimestamp(second, timezone.utc).isoformat()
+        _ts_cache = (second, cached_iso)
+    return cached_iso
+
 
 class SIReason(Enum):
     """Raisons de SI"""
@@ -25,6 +60,26 @@ class SIReason(Enum):
     SPAM = "spam"
 
 
+# Couleur Discord selon gravité (index = gravité - 1)
+_SEVERITY_COLORS = (
+    0xFFA500,  # Orange clair
+    0xFF8C00,  # Orange
+    0xFF4500,  # Rouge-orange
+    0xFF0000,  # Rouge
+    0x8B0000   # Rouge foncé
+)
+
+# Emojis selon raison
+_REASON_EMOJI = {
+    SIReason.VANDALISME: "🚨",
+    SIReason.LANGUE: "🌐",
+    SIReason.AUTOPROMO: "📢",
+    SIReason.CONTENU_SENSIBLE: "⚠️",
+    SIReason.COPIE: "📋",
+    SIReason.SPAM: "🗑️"
+}
+
+
 class SIDecision:
     """Décision de SI avec justification"""
     
@@ -49,7 +104,12 @@ class SIDecision:
         self.confidence = confidence
         self.details = details
         self.severity = min(5, max(1, severity))
-        self.timestamp = datetime.now(timezone.utc)
+        self.timestamp_iso = _now_iso()
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Horodatage de la décision (UTC)"""
+        return datetime.fromisoformat(self.timestamp_iso)
     
     def to_dict(self) -> Dict:
         """Convertit en dictionnaire"""
@@ -59,7 +119,7 @@ class SIDecision:
             "confidence": self.confidence,
             "details": self.details,
             "severity": self.severity,
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp_iso
         }
 
 
@@ -85,9 +145,23 @@ class SINotifier:
         self.enabled = enabled
         self.user_mentions = user_mentions
         
-        # Anti-spam : cooldown par page
-        self.page_cooldowns = {}
+        # Session HTTP partagée : connexions (et TLS) réutilisées entre envois
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=2, backoff_factor=0.3)
+        )
+        self._session.mount("https://", adapter)
+        
+        # Anti-spam : cooldown par page (titre -> time.monotonic()), du plus
+        # ancien au plus récent pour purger les entrées expirées par la tête
+        self.page_cooldowns = OrderedDict()
         self.cooldown_duration = 300  # 5 minutes
+        # Pages en cours d'envoi, et verrou des cooldowns / statistiques
+        # (notify_batch appelle notify depuis plusieurs threads)
+        self._in_flight = set()
+        self._lock = threading.Lock()
         
         # Statistiques
         self.stats = {
@@ -106,13 +180,16 @@ class SINotifier:
         Returns:
             bool: True si en cooldown
         """
-        if page_title not in self.page_cooldowns:
-            return False
+        now = time.monotonic()
         
-        last_notification = self.page_cooldowns[page_title]
-        elapsed = time.time() - last_notification
+        # Purge paresseuse des cooldowns expirés (en tête de file)
+        while self.page_cooldowns:
+            _, oldest_time = next(iter(self.page_cooldowns.items()))
+            if now - oldest_time < self.cooldown_duration:
+                break
+            self.page_cooldowns.popitem(last=False)
         
-        return elapsed < self.cooldown_duration
+        return page_title in self.page_cooldowns
     
     def _set_cooldown(self, page_title: str):
         """
@@ -121,21 +198,28 @@ class SINotifier:
         Args:
             page_title: Titre de la page
         """
-        self.page_cooldowns[page_title] = time.time()
+        self.page_cooldowns[page_title] = time.monotonic()
+        self.page_cooldowns.move_to_end(page_title)
+        
+        while len(self.page_cooldowns) > MAX_COOLDOWN_ENTRIES:
+            self.page_cooldowns.popitem(last=False)
     
-    def _format_diff_url(self, page_title: str, wiki_base: str = "https://fr.vikidia.org") -> str:
+    def _format_urls(self, page_title: str, wiki_base: str = "https://fr.vikidia.org") -> Tuple[str, str]:
         """
-        Génère l'URL du diff
+        Génère l'URL de la page et celle du diff (titre encodé une seule fois)
         
         Args:
             page_title: Titre de la page
             wiki_base: URL de base du wiki
             
         Returns:
-            URL du diff
+            (URL de la page, URL du diff)
         """
         encoded_title = urllib.parse.quote(page_title.replace(' ', '_'))
-        return f"{wiki_base}/w/index.php?title={encoded_title}&diff=cur&oldid=prev"
+        return (
+            f"{wiki_base}/wiki/{encoded_title}",
+            f"{wiki_base}/w/index.php?title={encoded_title}&diff=cur&oldid=prev"
+        )
     
     def _send_discord(
         self,
@@ -159,26 +243,38 @@ class SINotifier:
         if not self.discord_webhook:
             return False
         
-        # Couleur selon gravité
-        colors = {
-            1: 0xFFA500,  # Orange clair
-            2: 0xFF8C00,  # Orange
-            3: 0xFF4500,  # Rouge-orange
-            4: 0xFF0000,  # Rouge
-            5: 0x8B0000   # Rouge foncé
-        }
-        color = colors.get(decision.severity, 0xFF0000)
-        
-        # Emojis selon raison
-        emoji_map = {
-            SIReason.VANDALISME: "🚨",
-            SIReason.LANGUE: "🌐",
-            SIReason.AUTOPROMO: "📢",
-            SIReason.CONTENU_SENSIBLE: "⚠️",
-            SIReason.COPIE: "📋",
-            SIReason.SPAM: "🗑️"
-        }
-        emoji = emoji_map.get(decision.reason, "⚠️")
+        payload = self._build_discord_payload(page_title, decision, page_url, diff_url)
+        
+        try:
+            response = self._session.post(
+                self.discord_webhook,
+                json=payload,
+                timeout=10
+            )
+            response.raise_for_status()
+            logger.info(f"Notification Discord SI envoyée: {page_title}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erreur notification Discord SI: {e}")
+            return False
+    
+    def _build_discord_payload(
+        self,
+        page_title: str,
+        decision: SIDecision,
+        page_url: str,
+        diff_url: str
+    ) -> Dict:
+        """
+        Construit le message Discord (embed + mentions)
+        
+        Returns:
+            Payload JSON du webhook
+        """
+        # Gravité déjà bornée à 1-5 par SIDecision
+        color = _SEVERITY_COLORS[decision.severity - 1]
+        emoji = _REASON_EMOJI.get(decision.reason, "⚠️")
         
         # Construction de l'embed
         embed = {
@@ -215,27 +311,13 @@ class SINotifier:
             "footer": {
                 "text": "BotCélian - Détection SI"
             },
-            "timestamp": decision.timestamp.isoformat()
+            "timestamp": decision.timestamp_iso
         }
         
-        payload = {
+        return {
             "content": self.user_mentions,
             "embeds": [embed]
         }
-        
-        try:
-            response = requests.post(
-                self.discord_webhook,
-                json=payload,
-                timeout=10
-            )
-            response.raise_for_status()
-            logger.info(f"Notification Discord SI envoyée: {page_title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erreur notification Discord SI: {e}")
-            return False
     
     def _send_ntfy(
         self,
@@ -257,6 +339,35 @@ class SINotifier:
         if not self.ntfy_topic:
             return False
         
+        url, data, headers = self._build_ntfy_request(page_title, decision, page_url)
+        
+        try:
+            response = self._session.post(
+                url,
+                data=data,
+                headers=headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            logger.info(f"Notification Ntfy SI envoyée: {page_title}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erreur notification Ntfy SI: {e}")
+            return False
+    
+    def _build_ntfy_request(
+        self,
+        page_title: str,
+        decision: SIDecision,
+        page_url: str
+    ) -> Tuple[str, bytes, Dict[str, str]]:
+        """
+        Construit la requête Ntfy
+        
+        Returns:
+            (url, corps, en-têtes)
+        """
         url = f"https://ntfy.sh/{self.ntfy_topic}"
         
         # Priorité selon gravité
@@ -270,25 +381,49 @@ class SINotifier:
             f"Lien: {page_url}"
         )
         
-        try:
-            response = requests.post(
-                url,
-                data=message.encode('utf-8'),
-                headers={
-                    "Title": f"SI - {page_title}",
-                    "Priority": str(priority),
-                    "Tags": "warning,rotating_light",
-                    "Click": page_url
-                },
-                timeout=10
-            )
-            response.raise_for_status()
-            logger.info(f"Notification Ntfy SI envoyée: {page_title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erreur notification Ntfy SI: {e}")
+        headers = {
+            "Title": f"SI - {page_title}",
+            "Priority": str(priority),
+            "Tags": "warning,rotating_light",
+            "Click": page_url
+        }
+        return url, message.encode('utf-8'), headers
+    
+    def _reserve(self, page_title: str, decision: SIDecision) -> bool:
+        """
+        Vérifie qu'une notification peut partir et réserve la page
+        
+        Une page en cours d'envoi compte comme en cooldown.
+        
+        Returns:
+            bool: True si la notification doit être envoyée
+        """
+        if not self.enabled:
+            logger.debug("Notifications SI désactivées")
             return False
+        
+        if not decision.should_add_si:
+            logger.debug(f"Pas de SI pour {page_title}")
+            return False
+        
+        # Vérifier cooldown
+        with self._lock:
+            if self._is_in_cooldown(page_title) or page_title in self._in_flight:
+                logger.info(f"Page en cooldown: {page_title}")
+                self.stats["suppressed_cooldown"] += 1
+                return False
+            self._in_flight.add(page_title)
+        return True
+    
+    def _release(self, page_title: str, success: bool):
+        """Libère la page réservée et active le cooldown si succès"""
+        with self._lock:
+            self._in_flight.discard(page_title)
+            if success:
+                self._set_cooldown(page_title)
+                self.stats["notified"] += 1
+            else:
+                self.stats["failed"] += 1
     
     def notify(
         self,
@@ -307,24 +442,31 @@ class SINotifier:
         Returns:
             bool: True si au moins une notification réussie
         """
-        if not self.enabled:
-            logger.debug("Notifications SI désactivées")
+        if not self._reserve(page_title, decision):
             return False
         
-        if not decision.should_add_si:
-            logger.debug(f"Pas de SI pour {page_title}")
-            return False
+        success = False
+        try:
+            success = self._send_all(page_title, decision, wiki_base)
+        finally:
+            self._release(page_title, success)
         
-        # Vérifier cooldown
-        if self._is_in_cooldown(page_title):
-            logger.info(f"Page en cooldown: {page_title}")
-            self.stats["suppressed_cooldown"] += 1
-            return False
+        return success
+    
+    def _send_all(
+        self,
+        page_title: str,
+        decision: SIDecision,
+        wiki_base: str
+    ) -> bool:
+        """
+        Envoie la notification sur tous les canaux
         
+        Returns:
+            bool: True si au moins un canal a réussi
+        """
         # URLs
-        encoded_title = urllib.parse.quote(page_title.replace(' ', '_'))
-        page_url = f"{wiki_base}/wiki/{encoded_title}"
-        diff_url = self._format_diff_url(page_title, wiki_base)
+        page_url, diff_url = self._format_urls(page_title, wiki_base)
         
         # Envoyer sur tous les canaux
         success = False
@@ -335,13 +477,6 @@ class SINotifier:
         if self._send_ntfy(page_title, decision, page_url):
             success = True
         
-        # Activer cooldown
-        if success:
-            self._set_cooldown(page_title)
-            self.stats["notified"] += 1
-        else:
-            self.stats["failed"] += 1
-        
         return success
     
     def notify_batch(
@@ -359,13 +494,132 @@ class SINotifier:
         Returns:
             Nombre de notifications réussies
         """
-        success_count = 0
+        if not notifications:
+            return 0
         
-        for page_title, decision in notifications:
-            if self.notify(page_title, decision, wiki_base):
-                success_count += 1
+        # Envois réseau indépendants : en parallèle
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as executor:
+            results = list(executor.map(
+                lambda item: self.notify(item[0], item[1], wiki_base),
+                notifications
+            ))
+        
+        return sum(results)
+    
+    async def notify_async(
+        self,
+        page_title: str,
+        decision: SIDecision,
+        wiki_base: str = "https://fr.vikidia.org",
+        client=None
+    ) -> bool:
+        """
+        Version asynchrone de notify : Discord et Ntfy en parallèle
+        
+        Nécessite httpx (importé à l'appel).
+        
+        Args:
+            page_title: Titre de la page
+            decision: Décision SI
+            wiki_base: URL de base du wiki
+            client: httpx.AsyncClient partagé (optionnel)
+            
+        Returns:
+            bool: True si au moins une notification réussie
+        """
+        if not self._reserve(page_title, decision):
+            return False
+        
+        success = False
+        try:
+            if client is None:
+                import httpx
+                async with httpx.AsyncClient(http2=True, timeout=10) as own_client:
+                    success = await self._send_all_async(
+                        own_client, page_title, decision, wiki_base
+                    )
+            else:
+                success = await self._send_all_async(client, page_title, decision, wiki_base)
+        finally:
+            self._release(page_title, success)
+        
+        return success
+    
+    async def _send_all_async(
+        self,
+        client,
+        page_title: str,
+        decision: SIDecision,
+        wiki_base: str
+    ) -> bool:
+        """
+        Envoie la notification sur tous les canaux en parallèle
+        
+        Returns:
+            bool: True si au moins un canal a réussi
+        """
+        page_url, diff_url = self._format_urls(page_title, wiki_base)
+        
+        sends = []
+        if self.discord_webhook:
+            payload = self._build_discord_payload(page_title, decision, page_url, diff_url)
+            sends.append(("Discord", client.post(self.discord_webhook, json=payload)))
+        if self.ntfy_topic:
+            url, data, headers = self._build_ntfy_request(page_title, decision, page_url)
+            sends.append(("Ntfy", client.post(url, content=data, headers=headers)))
+        
+        if not sends:
+            return False
+        
+        responses = await asyncio.gather(
+            *[send for _, send in sends],
+            return_exceptions=True
+        )
+        
+        success = False
+        for (channel, _), response in zip(sends, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Erreur notification {channel} SI: {response}")
+            elif response.is_error:
+                logger.error(f"Erreur notification {channel} SI: HTTP {response.status_code}")
+            else:
+                logger.info(f"Notification {channel} SI envoyée: {page_title}")
+                success = True
+        
+        return success
+    
+    async def notify_batch_async(
+        self,
+        notifications: List[tuple],
+        wiki_base: str = "https://fr.vikidia.org"
+    ) -> int:
+        """
+        Version asynchrone de notify_batch (un seul client HTTP/2)
+        
+        Args:
+            notifications: Liste de (page_title, decision)
+            wiki_base: URL de base du wiki
+            
+        Returns:
+            Nombre de notifications réussies
+        """
+        if not notifications:
+            return 0
+        
+        import httpx
+        
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+        
+        async with httpx.AsyncClient(http2=True, timeout=10) as client:
+            async def limited(page_title, decision):
+                async with semaphore:
+                    return await self.notify_async(page_title, decision, wiki_base, client)
+            
+            results = await asyncio.gather(
+                *[limited(page_title, decision) for page_title, decision in notifications]
+            )
         
-        return success_count
+        return sum(results)
     
     def get_stats(self) -> Dict[str, int]:
         """Retourne les statistiques"""
@@ -5,28 +5,73 @@ Module de logging structuré JSON pour analyses et statistiques
 """
 
 import os
+import copy
 import json
+import atexit
 import logging
+import functools
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+
+try:
+    import orjson
+except ImportError:  # orjson optionnel
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Événements écrits avant de vider le tampon du fichier de log
+FLUSH_EVERY = 32
+
+# Taille du tampon d'écriture (octets)
+WRITE_BUFFER_SIZE = 1 << 16
+
+# Taille de fichier à partir de laquelle aggregate_stats passe par pandas
+PANDAS_MIN_BYTES = 1 << 20
+
+# Nombre de résultats de aggregate_stats gardés en mémoire
+STATS_CACHE_SIZE = 8
+
+
+def _dumps_line(event: Dict[str, Any]) -> bytes:
+    """Sérialise un événement en une ligne JSON (UTF-8, avec saut de ligne)"""
+    if orjson is not None:
+        return orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _loads_line(line: bytes) -> Any:
+    """Désérialise une ligne JSON lue en binaire"""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
 
 class StructuredLogger:
     """Gère les logs structurés au format JSON Lines"""
     
-    def __init__(self, log_dir="logs"):
+    def __init__(self, log_dir="logs", flush_every=FLUSH_EVERY):
         """
         Args:
             log_dir: Répertoire des logs
+            flush_every: Nombre d'événements entre deux vidages du tampon
         """
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.current_file = None
         self.current_month = None
+        self.flush_every = max(1, flush_every)
+        # Fichier du mois courant, gardé ouvert entre les événements
+        self._fh = None
+        self._pending = 0
+        # Totaux du mois courant tenus à jour à chaque événement (voir _save_totals)
+        self._totals = None
+        self._totals_month = None
+        self._totals_size = 0
+        self._aggregate_cached = functools.lru_cache(maxsize=STATS_CACHE_SIZE)(self._aggregate_file)
+        atexit.register(self.close)
     
     def _get_log_file(self):
         """
@@ -40,12 +85,34 @@ class StructuredLogger:
         
         # Changer de fichier si nouveau mois
         if month_str != self.current_month:
+            self.close()
             self.current_month = month_str
             self.current_file = self.log_dir / f"{month_str}.jsonl"
             logger.info(f"Fichier de log: {self.current_file}")
         
         return self.current_file
     
+    def flush(self):
+        """Écrit sur disque les événements en attente"""
+        if self._fh is not None and self._pending:
+            try:
+                self._fh.flush()
+            except Exception as e:
+                logger.error(f"Erreur écriture log structuré: {e}")
+            self._pending = 0
+            self._save_totals()
+    
+    def close(self):
+        """Vide le tampon et ferme le fichier de log courant"""
+        if self._fh is None:
+            return
+        self.flush()
+        try:
+            self._fh.close()
+        except Exception as e:
+            logger.error(f"Erreur fermeture log structuré: {e}")
+        self._fh = None
+    
     def log_event(
         self,
         script: str,
@@ -90,8 +157,18 @@ class StructuredLogger:
         
         try:
             log_file = self._get_log_file()
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            if self._totals_month != self.current_month:
+                self._seed_totals(log_file)
+            if self._fh is None:
+                self._fh = open(log_file, 'ab', buffering=WRITE_BUFFER_SIZE)
+            line = _dumps_line(event)
+            self._fh.write(line)
+            self._pending += 1
+            if self._totals is not None:
+                self._add_to_totals(self._totals, event)
+                self._totals_size += len(line)
+            if self._pending >= self.flush_every:
+                self.flush()
             logger.debug(f"Événement loggé: {page}")
         except Exception as e:
             logger.error(f"Erreur écriture log structuré: {e}")
@@ -113,46 +190,85 @@ class StructuredLogger:
         Returns:
             Liste d'événements
         """
-        if month is None:
-            month = datetime.now(timezone.utc).strftime("%Y-%m")
+        events = list(self.iter_logs(month=month, script=script, si_only=si_only))
+        logger.info(f"Chargé {len(events)} événements ({month or 'mois courant'})")
+        return events
+    
+    def iter_logs(
+        self,
+        month: Optional[str] = None,
+        script: Optional[str] = None,
+        si_only: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt les logs un événement à la fois (sans tout charger en mémoire)
         
-        log_file = self.log_dir / f"{month}.jsonl"
+        Args:
+            month: Mois au format YYYY-MM (None = mois courant)
+            script: Filtrer par script
+            si_only: Uniquement les événements SI
+            
+        Returns:
+            Itérateur d'événements
+        """
+        log_file = self._month_file(month)
         
         if not log_file.exists():
             logger.warning(f"Fichier de log inexistant: {log_file}")
-            return []
+            return
         
-        events = []
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
+            with open(log_file, 'rb', buffering=1 << 20) as f:
                 for line in f:
                     if not line.strip():
                         continue
                     
                     try:
-                        event = json.loads(line)
-                        
-                        # Filtres
-                        if script and event.get("script") != script:
-                            continue
-                        if si_only and not event.get("si", False):
-                            continue
-                        
-                        events.append(event)
+                        event = _loads_line(line)
                     except json.JSONDecodeError as e:
                         logger.error(f"Ligne JSON invalide: {e}")
+                        continue
+                    
+                    # Filtres
+                    if script and event.get("script") != script:
+                        continue
+                    if si_only and not event.get("si", False):
+                        continue
+                    
+                    yield event
             
-            logger.info(f"Chargé {len(events)} événements depuis {log_file}")
-            return events
-            
-        except Exception as e:
+        except OSError as e:
             logger.error(f"Erreur lecture logs: {e}")
-            return []
+    
+    def _month_file(self, month: Optional[str] = None) -> Path:
+        """
+        Chemin du fichier de log d'un mois, à jour des événements en tampon
+        
+        Args:
+            month: Mois au format YYYY-MM (None = mois courant)
+            
+        Returns:
+            Path: Chemin du fichier
+        """
+        if month is None:
+            month = datetime.now(timezone.utc).strftime("%Y-%m")
+        
+        # Inclure les événements encore dans le tampon d'écriture
+        if month == self.current_month:
+            self.flush()
+        
+        return self.log_dir / f"{month}.jsonl"
+    
+    @staticmethod
+    def _totals_file(log_file: Path) -> Path:
+        """Fichier des totaux pré-agrégés d'un fichier de log ({mois}.stats.json)"""
+        return log_file.with_suffix(".stats.json")
     
     def aggregate_stats(
         self,
         month: Optional[str] = None,
-        script: Optional[str] = None
+        script: Optional[str] = None,
+        events: Optional[Iterable[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Agrège les statistiques des logs
@@ -160,13 +276,134 @@ class StructuredLogger:
         Args:
             month: Mois à analyser (None = mois courant)
             script: Filtrer par script
+            events: Événements déjà chargés et filtrés (évite de relire le fichier)
+            
+        Returns:
+            Dictionnaire de statistiques
+        """
+        if events is not None:
+            return self._aggregate_events(events, month)
+        
+        log_file = self._month_file(month)
+        try:
+            stat = log_file.stat()
+            file_version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            file_version = None
+        
+        # Fichier inchangé depuis le dernier appel : résultat en cache
+        stats = self._aggregate_cached(log_file, month, script, file_version)
+        return copy.deepcopy(stats)
+    
+    def _aggregate_file(
+        self,
+        log_file: Path,
+        month: Optional[str],
+        script: Optional[str],
+        file_version: Optional[Tuple[int, int]]
+    ) -> Dict[str, Any]:
+        """
+        Agrège le fichier de log d'un mois (voir aggregate_stats)
+        
+        Args:
+            log_file: Fichier de log du mois
+            month: Mois analysé
+            script: Filtrer par script
+            file_version: (mtime, taille) du fichier, clé du cache uniquement
+            
+        Returns:
+            Dictionnaire de statistiques
+        """
+        # Totaux pré-agrégés à jour : pas besoin de relire le fichier
+        if script is None and file_version is not None:
+            totals = self._load_totals(log_file, file_version[1])
+            if totals is not None:
+                return self._totals_stats(totals, month)
+        
+        # Gros fichiers : agrégation vectorisée si pandas est installé
+        if file_version is not None and file_version[1] >= PANDAS_MIN_BYTES:
+            stats = self._aggregate_with_pandas(log_file, month, script)
+            if stats is not None:
+                return stats
+        
+        return self._aggregate_events(self.iter_logs(month=month, script=script), month)
+    
+    def _aggregate_events(
+        self,
+        events: Iterable[Dict[str, Any]],
+        month: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Agrège une suite d'événements
+        
+        Args:
+            events: Événements à agréger
+            month: Mois analysé
             
         Returns:
             Dictionnaire de statistiques
         """
-        events = self.load_logs(month=month, script=script)
+        totals = self._new_totals()
+        for event in events:
+            self._add_to_totals(totals, event)
+        return self._totals_stats(totals, month)
+    
+    @staticmethod
+    def _new_totals() -> Dict[str, Any]:
+        """Compteurs vides (voir _add_to_totals)"""
+        return {
+            "total_events": 0,
+            "pages": set(),
+            "si_total": 0,
+            "actions": Counter(),
+            "qualite": Counter(),
+            "problemes": Counter(),
+            "scripts": Counter(),
+            "confiance_sum": 0,
+            "confiance_count": 0
+        }
+    
+    @staticmethod
+    def _add_to_totals(totals: Dict[str, Any], event: Dict[str, Any]):
+        """Ajoute un événement aux compteurs"""
+        totals["total_events"] += 1
+        totals["pages"].add(event.get("page", ""))
+        
+        if event.get("si", False):
+            totals["si_total"] += 1
+        
+        # Actions
+        totals["actions"].update(event.get("action", ()))
+        
+        # Qualité
+        totals["qualite"][event.get("qualite", "inconnue")] += 1
+        
+        # Problèmes
+        totals["problemes"].update(event.get("problemes", ()))
+        
+        # Scripts
+        totals["scripts"][event.get("script", "unknown")] += 1
+        
+        # Confiance
+        confiance = event.get("confiance", 0)
+        if confiance > 0:
+            totals["confiance_sum"] += confiance
+            totals["confiance_count"] += 1
+    
+    @staticmethod
+    def _totals_stats(totals: Dict[str, Any], month: Optional[str]) -> Dict[str, Any]:
+        """
+        Calcule les statistiques à partir des compteurs
         
-        if not events:
+        Args:
+            totals: Compteurs (voir _new_totals)
+            month: Mois analysé
+            
+        Returns:
+            Dictionnaire de statistiques
+        """
+        total_events = totals["total_events"]
+        if not total_events:
             return {
                 "total_events": 0,
                 "pages_uniques": 0,
@@ -178,67 +415,182 @@ class StructuredLogger:
                 "scripts": {}
             }
         
-        # Compteurs
-        pages = set()
-        si_count = 0
-        action_counts = defaultdict(int)
-        qualite_counts = defaultdict(int)
-        probleme_counts = defaultdict(int)
-        script_counts = defaultdict(int)
-        confiances = []
-        
-        for event in events:
-            pages.add(event.get("page", ""))
-            
-            if event.get("si", False):
-                si_count += 1
-            
-            # Actions
-            for action in event.get("action", []):
-                action_counts[action] += 1
-            
-            # Qualité
-            qualite = event.get("qualite", "inconnue")
-            qualite_counts[qualite] += 1
-            
-            # Problèmes
-            for probleme in event.get("problemes", []):
-                probleme_counts[probleme] += 1
-            
-            # Scripts
-            script_name = event.get("script", "unknown")
-            script_counts[script_name] += 1
-            
-            # Confiance
-            confiance = event.get("confiance", 0)
-            if confiance > 0:
-                confiances.append(confiance)
-        
         # Calculs
+        si_count = totals["si_total"]
         confiance_moyenne = (
-            sum(confiances) / len(confiances) if confiances else 0
+            totals["confiance_sum"] / totals["confiance_count"]
+            if totals["confiance_count"] else 0
         )
         
         stats = {
-            "total_events": len(events),
-            "pages_uniques": len(pages),
+            "total_events": total_events,
+            "pages_uniques": len(totals["pages"]),
             "si_total": si_count,
-            "si_percentage": round((si_count / len(events)) * 100, 2) if events else 0,
-            "actions": dict(action_counts),
-            "qualite": dict(qualite_counts),
-            "problemes": dict(probleme_counts),
-            "scripts": dict(script_counts),
+            "si_percentage": round((si_count / total_events) * 100, 2),
+            "actions": dict(totals["actions"]),
+            "qualite": dict(totals["qualite"]),
+            "problemes": dict(totals["problemes"]),
+            "scripts": dict(totals["scripts"]),
             "confiance_moyenne": round(confiance_moyenne, 2),
             "periode": month or datetime.now(timezone.utc).strftime("%Y-%m")
         }
         
         return stats
     
+    def _seed_totals(self, log_file: Path):
+        """
+        Initialise les totaux du mois courant (au premier événement du mois)
+        
+        Reprend le fichier .stats.json s'il est à jour, sinon relit le
+        fichier de log une fois.
+        
+        Args:
+            log_file: Fichier de log du mois courant
+        """
+        self._totals_month = self.current_month
+        try:
+            size = log_file.stat().st_size
+        except OSError:
+            size = 0
+        
+        totals = self._load_totals(log_file, size)
+        if totals is None:
+            totals = self._new_totals()
+            if size:
+                for event in self.iter_logs(month=self.current_month):
+                    self._add_to_totals(totals, event)
+        
+        self._totals = totals
+        self._totals_size = size
+    
+    def _load_totals(self, log_file: Path, log_size: int) -> Optional[Dict[str, Any]]:
+        """
+        Lit les totaux pré-agrégés d'un fichier de log
+        
+        Args:
+            log_file: Fichier de log du mois
+            log_size: Taille actuelle du fichier de log
+            
+        Returns:
+            Compteurs, ou None si absents ou en retard sur le fichier de log
+        """
+        try:
+            with open(self._totals_file(log_file), 'rb') as f:
+                data = _loads_line(f.read())
+            if data.get("log_size") != log_size:
+                return None
+            return {
+                "total_events": data["total_events"],
+                "pages": set(data["pages"]),
+                "si_total": data["si_total"],
+                "actions": Counter(data["actions"]),
+                "qualite": Counter(data["qualite"]),
+                "problemes": Counter(data["problemes"]),
+                "scripts": Counter(data["scripts"]),
+                "confiance_sum": data["confiance_sum"],
+                "confiance_count": data["confiance_count"]
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+    
+    def _save_totals(self):
+        """Écrit les totaux du mois courant dans {mois}.stats.json"""
+        if self._totals is None or self.current_file is None:
+            return
+        
+        log_file = self.current_file
+        try:
+            if log_file.stat().st_size != self._totals_size:
+                # Un autre processus écrit dans le même fichier : les totaux
+                # ne sont plus fiables, aggregate_stats relira le fichier
+                logger.debug(f"Totaux pré-agrégés abandonnés pour {log_file}")
+                self._totals = None
+                return
+            
+            data = dict(self._totals, pages=list(self._totals["pages"]), log_size=self._totals_size)
+            totals_file = self._totals_file(log_file)
+            tmp_file = totals_file.with_name(totals_file.name + ".tmp")
+            tmp_file.write_bytes(_dumps_line(data))
+            os.replace(tmp_file, totals_file)
+        except Exception as e:
+            logger.error(f"Erreur écriture stats pré-agrégées: {e}")
+    
+    def _aggregate_with_pandas(
+        self,
+        log_file: Path,
+        month: Optional[str],
+        script: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Équivalent vectorisé de aggregate_stats (pandas importé à l'appel)
+        
+        Args:
+            log_file: Fichier de log du mois
+            month: Mois analysé
+            script: Filtrer par script
+            
+        Returns:
+            Dictionnaire de statistiques, ou None si pandas est absent ou si le
+            fichier ne se lit pas d'un bloc (la boucle Python prend le relais)
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            return None
+        
+        try:
+            df = pd.read_json(log_file, lines=True, dtype=False, convert_dates=False)
+        except ValueError as e:
+            logger.debug(f"Lecture pandas impossible, agrégation ligne à ligne: {e}")
+            return None
+        
+        def column(name, default):
+            if name in df:
+                return df[name]
+            return pd.Series([default] * len(df), index=df.index, dtype=object)
+        
+        if script:
+            df = df[column("script", None) == script]
+        
+        if df.empty:
+            return {
+                "total_events": 0,
+                "pages_uniques": 0,
+                "si_total": 0,
+                "actions": {},
+                "qualite": {},
+                "problemes": {},
+                "confiance_moyenne": 0,
+                "scripts": {}
+            }
+        
+        def counts(series):
+            return {key: int(count) for key, count in series.value_counts(sort=False).items()}
+        
+        total_events = len(df)
+        si_count = int(column("si", False).fillna(False).astype(bool).sum())
+        confiances = pd.to_numeric(column("confiance", 0), errors="coerce")
+        confiances = confiances[confiances > 0]
+        
+        return {
+            "total_events": total_events,
+            "pages_uniques": int(column("page", "").fillna("").nunique()),
+            "si_total": si_count,
+            "si_percentage": round((si_count / total_events) * 100, 2),
+            "actions": counts(column("action", []).explode()),
+            "qualite": counts(column("qualite", "inconnue").fillna("inconnue")),
+            "problemes": counts(column("problemes", []).explode()),
+            "scripts": counts(column("script", "unknown").fillna("unknown")),
+            "confiance_moyenne": round(float(confiances.mean()), 2) if len(confiances) else 0,
+            "periode": month or datetime.now(timezone.utc).strftime("%Y-%m")
+        }
+    
     def get_top_pages(
         self,
         month: Optional[str] = None,
         limit: int = 10,
-        si_only: bool = False
+        si_only: bool = False,
+        events: Optional[Iterable[Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Récupère les pages les plus traitées
@@ -247,29 +599,56 @@ class StructuredLogger:
             month: Mois à analyser
             limit: Nombre maximum de résultats
             si_only: Uniquement les pages avec SI
+            events: Événements déjà chargés (évite de relire le fichier)
             
         Returns:
             Liste des pages avec compteurs
         """
-        events = self.load_logs(month=month, si_only=si_only)
+        if events is None:
+            events = self.iter_logs(month=month, si_only=si_only)
+        elif si_only:
+            events = (event for event in events if event.get("si", False))
+        
+        page_counts = self._new_page_counts()
+        for event in events:
+            self._count_page(page_counts, event)
         
-        page_counts = defaultdict(lambda: {
+        return self._rank_pages(page_counts, limit)
+    
+    @staticmethod
+    def _new_page_counts() -> Dict[str, Dict[str, Any]]:
+        """Compteurs par page (voir get_top_pages)"""
+        return defaultdict(lambda: {
             "count": 0,
             "si": 0,
             "actions": [],
             "last_event": None
         })
+    
+    @staticmethod
+    def _count_page(page_counts: Dict[str, Dict[str, Any]], event: Dict[str, Any]):
+        """Ajoute un événement aux compteurs de sa page"""
+        data = page_counts[event.get("page", "")]
+        data["count"] += 1
         
-        for event in events:
-            page = event.get("page", "")
-            page_counts[page]["count"] += 1
-            
-            if event.get("si", False):
-                page_counts[page]["si"] += 1
-            
-            page_counts[page]["actions"].extend(event.get("action", []))
-            page_counts[page]["last_event"] = event.get("timestamp")
+        if event.get("si", False):
+            data["si"] += 1
+        
+        data["actions"].extend(event.get("action", []))
+        data["last_event"] = event.get("timestamp")
+    
+    @staticmethod
+    def _rank_pages(page_counts: Dict[str, Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Classe les pages par nombre d'événements
         
+        Args:
+            page_counts: Compteurs par page
+            limit: Nombre maximum de résultats
+            
+        Returns:
+            Liste des pages avec compteurs
+        """
         # Trier par nombre d'événements
         sorted_pages = sorted(
             page_counts.items(),
@@ -288,6 +667,36 @@ class StructuredLogger:
             for page, data in sorted_pages
         ]
     
+    def analyze_month(
+        self,
+        month: Optional[str] = None,
+        script: Optional[str] = None,
+        top_n: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Statistiques et pages les plus traitées en une seule lecture du fichier
+        
+        Args:
+            month: Mois à analyser (None = mois courant)
+            script: Filtrer par script
+            top_n: Nombre de pages dans le classement
+            
+        Returns:
+            {"stats": ..., "top_pages": ...}
+        """
+        page_counts = self._new_page_counts()
+        
+        def counted(events):
+            for event in events:
+                self._count_page(page_counts, event)
+                yield event
+        
+        stats = self._aggregate_events(counted(self.iter_logs(month=month, script=script)), month)
+        return {
+            "stats": stats,
+            "top_pages": self._rank_pages(page_counts, top_n)
+        }
+    
     def export_stats_json(
         self,
         output_file: str,
@@ -300,14 +709,13 @@ class StructuredLogger:
             output_file: Fichier de sortie
             month: Mois à exporter
         """
-        stats = self.aggregate_stats(month=month)
-        top_pages = self.get_top_pages(month=month, limit=20)
+        analysis = self.analyze_month(month=month, top_n=20)
         
         export_data = {
             "generated_at": datetime.now(timezone.utc).isoformat(),
             "periode": month or datetime.now(timezone.utc).strftime("%Y-%m"),
-            "stats": stats,
-            "top_pages": top_pages
+            "stats": analysis["stats"],
+            "top_pages": analysis["top_pages"]
         }
         
         try:
@@ -318,13 +726,19 @@ class StructuredLogger:
             logger.error(f"Erreur export stats: {e}")
 
 
-# Singleton global
-_logger_instance = None
+# Une instance par répertoire de logs (chemin absolu)
+@functools.cache
+def _get_logger(log_dir: Path) -> StructuredLogger:
+    """Crée le logger structuré d'un répertoire"""
+    return StructuredLogger(log_dir)
 
 
 def get_logger(log_dir="logs") -> StructuredLogger:
     """
-    Récupère l'instance singleton du logger structuré
+    Récupère l'instance du logger structuré pour ce répertoire
+    
+    "logs", Path("logs") et le chemin absolu équivalent donnent la même
+    instance.
     
     Args:
         log_dir: Répertoire des logs
@@ -332,26 +746,20 @@ def get_logger(log_dir="logs") -> StructuredLogger:
     Returns:
         Instance de StructuredLogger
     """
-    global _logger_instance
-    if _logger_instance is None:
-        _logger_instance = StructuredLogger(log_dir)
-    return _logger_instance
+    return _get_logger(Path(log_dir).resolve())
 
 
 # Fonctions helper
 def log_event(**kwargs):
     """Helper pour log_event"""
-    logger = get_logger()
-    logger.log_event(**kwargs)
+    get_logger().log_event(**kwargs)
 
 
 def load_logs(**kwargs):
     """Helper pour load_logs"""
-    logger = get_logger()
-    return logger.load_logs(**kwargs)
+    return get_logger().load_logs(**kwargs)
 
 
 def aggregate_stats(**kwargs):
     """Helper pour aggregate_stats"""
-    logger = get_logger()
-    return logger.aggregate_stats(**kwargs)
\ No newline at end of file
+    return get_logger().aggregate_stats(**kwargs)
\ No newline at end of file
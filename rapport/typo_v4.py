@@ -11,6 +11,80 @@ from typing import Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Balises dont le contenu est protégé (<ref>, <math>, <code>, <nowiki>, ...)
+_PROTECTED_TAGS = ['ref', 'math', 'code', 'nowiki', 'pre', 'source', 'syntaxhighlight', 'poem', 'score']
+
+# Zones protégées sans imbrication, en un seul passage sur le texte
+# (à une même position, la première alternative qui correspond l'emporte)
+_PROTECTED_ZONE_RE = re.compile(
+    # Balises auto-fermantes
+    r'(?i:<(?:{tags})[^>]*/>)'
+    # Balises avec contenu et galeries
+    r'|(?i:<(?P<tag>{tags}|gallery)[^>]*>.*?</(?P=tag)>)'
+    # Balises fermantes (importantes pour parsing)
+    r'|</[^>]+>'
+    # Liens externes [http...]
+    r'|\[(?:https?|ftp)://[^\]]+\]'
+    # URLs nues
+    r'|(?:https?|ftp)://[^\s<>"{{}}|\\^\[\]`]+'
+    # Tableaux wiki {{| ... |}}
+    r'|\{{\|.*?\|\}}'.format(tags='|'.join(_PROTECTED_TAGS)),
+    re.DOTALL
+)
+
+# Clé d'une zone protégée : son index entre deux NUL, absents du wikitexte
+# (voir _protect_all_sensitive_zones)
+_PLACEHOLDER_RE = re.compile(r'\x00(\d+)\x00')
+
+# Délimiteurs des zones imbriquées (modèles, liens internes)
+_TEMPLATE_TOKEN_RE = re.compile(r'\{\{|\}\}')
+_LINK_TOKEN_RE = re.compile(r'\[\[|\]\]')
+
+# Texte pouvant être modifié par _apply_corrections (surensemble de ses
+# règles) : sans aucun de ces caractères ni motifs, le texte est déjà propre
+# Apostrophes, guillemets, parenthèses, ponctuation haute (simple recherche
+# de caractère, bien plus rapide qu'une alternative de regex)
+_HAZARD_CHARS = "'`«»();:!?"
+_NEEDS_SPACING_WORK_RE = re.compile(
+    # Espace après . et , / points de suspension
+    r"[.,][^\s\d]"
+    # Minuscule en début de phrase ou de ligne
+    r"|[.!?]\s+[a-zàâçéèêëîïôûùüÿñæœ]|^[a-zàâçéèêëîïôûùüÿñæœ]"
+    # Espace avant . et , / tirets d'incise
+    r"|\s(?:[.,]|-\s)"
+    # Espaces multiples ou en fin de ligne, lignes vides multiples
+    r"|[ \t](?:[ \t]|$)|\n\n\n",
+    re.MULTILINE
+)
+
+# Corrections (voir _apply_corrections)
+_APOSTROPHE_SPACES_RE = re.compile(r"\s*'\s*")
+_QUOTE_OPEN_RE = re.compile(r'«\s*')
+_QUOTE_CLOSE_RE = re.compile(r'\s*»')
+_QUOTE_OPEN_SPACES_RE = re.compile(r'«\s{2,}')
+_QUOTE_CLOSE_SPACES_RE = re.compile(r'\s{2,}»')
+_PAREN_OPEN_SPACES_RE = re.compile(r'\(\s+')
+_PAREN_CLOSE_SPACES_RE = re.compile(r'\s+\)')
+_PAREN_SPACE_BEFORE_RE = re.compile(r'([^\s\(])\(')
+_PAREN_SPACE_AFTER_RE = re.compile(r'\)([^\s\)\.,;:!?\-])')
+_LOW_PUNCT_SPACE_BEFORE_RE = re.compile(r'\s+([.,])')
+_LOW_PUNCT_SPACE_AFTER_RE = re.compile(r'([.,])([^\s\d])')
+_HIGH_PUNCT_RE = re.compile(r'\s*([;:!?])\s*')
+_ELLIPSIS_RE = re.compile(r'\.\s*\.\s*\.+')
+_LONG_ELLIPSIS_RE = re.compile(r'\.{4,}')
+_DASH_RE = re.compile(r'([^\n\-])\s+-\s+')
+_SENTENCE_START_RE = re.compile(r'(^|[.!?]\s+)([a-zàâçéèêëîïôûùüÿñæœ])', re.MULTILINE)
+_MULTIPLE_SPACES_RE = re.compile(r'[ \t]{2,}')
+_TRAILING_SPACES_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+# Détection des types de corrections (voir get_summary)
+_HIGH_PUNCT_CHAR_RE = re.compile(r'[!?;:]')
+_PAREN_SPACES_RE = re.compile(r'\(\s|\s\)')
+_SPACED_ELLIPSIS_RE = re.compile(r'\.\s*\.\s*\.')
+_APOSTROPHE_CHAR_RE = re.compile(r"[''`]")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+[.,;]')
+
 
 class SafeTypoFixer:
     """Correcteur typographique avec protection maximale"""
@@ -19,24 +93,73 @@ class SafeTypoFixer:
     ABBREVS = ["J.-C.", "M.", "Mme.", "Mlle.", "Dr.", "etc.", "cf.", "p.", "vol.", "n°"]
     
     def __init__(self):
-        self.protected_zones = {}
-        self.protection_counter = 0
         self.changes_made = []
     
-    def _protect_zone(self, match):
-        """Protège une zone du traitement"""
-        key = f"__PROTECT_{self.protection_counter}__"
-        self.protection_counter += 1
-        self.protected_zones[key] = match.group(0)
-        return key
+    def _protect_nested(self, text: str, token_re, protect) -> str:
+        """
+        Protège les zones imbriquées ({{...}} ou [[...]]) en un seul passage
+        
+        Une pile des ouvertures suit la profondeur : chaque zone équilibrée
+        la plus externe est protégée d'un bloc. Si une ouverture n'est jamais
+        refermée, les zones équilibrées qu'elle contient sont protégées.
+        
+        Args:
+            text: Texte à protéger
+            token_re: Regex des délimiteurs (ouvrant|fermant)
+            protect: Fonction zone -> clé de protection
+            
+        Returns:
+            Texte avec les zones remplacées par leurs clés
+        """
+        starts = []
+        spans = []
+        for token in token_re.finditer(text):
+            if token.group(0) in ('{{', '[['):
+                starts.append(token.start())
+            elif starts:
+                start = starts.pop()
+                # Les zones déjà fermées à l'intérieur sont englobées
+                while spans and spans[-1][0] > start:
+                    spans.pop()
+                spans.append((start, token.end()))
+        
+        if not spans:
+            return text
+        
+        parts = []
+        last = 0
+        for start, end in spans:
+            parts.append(text[last:start])
+            parts.append(protect(text[start:end]))
+            last = end
+        parts.append(text[last:])
+        return "".join(parts)
     
-    def _restore_zones(self, text: str) -> str:
-        """Restaure toutes les zones protégées"""
-        for key, original in self.protected_zones.items():
-            text = text.replace(key, original)
-        return text
+    def _restore_zones(self, text: str, zones: List[str]) -> str:
+        """
+        Restaure toutes les zones protégées (en un passage par niveau)
+        
+        Args:
+            text: Texte avec clés de protection
+            zones: Zones protégées, indexées par le numéro de leur clé
+            
+        Returns:
+            Texte restauré
+        """
+        def restore(match):
+            index = int(match.group(1))
+            if index >= len(zones):
+                # Texte ressemblant à une clé mais présent dans l'original
+                return match.group(0)
+            zone = zones[index]
+            if '\x00' in zone:
+                # Une zone ne contient que des clés créées avant elle
+                zone = _PLACEHOLDER_RE.sub(restore, zone)
+            return zone
+        
+        return _PLACEHOLDER_RE.sub(restore, text)
     
-    def _protect_all_sensitive_zones(self, text: str) -> str:
+    def _protect_all_sensitive_zones(self, text: str, zones: List[str]) -> str:
         """
         Protège TOUTES les zones sensibles avant correction
         
@@ -46,99 +169,40 @@ class SafeTypoFixer:
         - Modèles {{...}}
         - Balises <ref>, <math>, <code>, <nowiki>, etc.
         - Galeries et tableaux
+        
+        Args:
+            text: Texte à protéger
+            zones: Liste (vide) remplie avec les zones protégées
+            
+        Returns:
+            Texte avec les zones remplacées par leurs clés
         """
-        # 1. Protéger balises fermantes (importantes pour parsing)
-        text = re.sub(r'</[^>]+>', self._protect_zone, text)
-        
-        # 2. Protéger balises auto-fermantes et ouvrantes avec contenu
-        # <ref>, <math>, <code>, <nowiki>, <pre>, <source>, <syntaxhighlight>
-        protected_tags = ['ref', 'math', 'code', 'nowiki', 'pre', 'source', 'syntaxhighlight', 'poem', 'score']
-        for tag in protected_tags:
-            # Balises avec contenu
-            text = re.sub(
-                rf'<{tag}[^>]*>.*?</{tag}>',
-                self._protect_zone,
-                text,
-                flags=re.DOTALL | re.IGNORECASE
-            )
-            # Balises auto-fermantes
-            text = re.sub(
-                rf'<{tag}[^>]*/>', 
-                self._protect_zone, 
-                text,
-                flags=re.IGNORECASE
-            )
-        
-        # 3. Protéger modèles (imbriqués)
-        # On protège de l'intérieur vers l'extérieur
-        max_iterations = 10
-        for _ in range(max_iterations):
-            # Modèles sans imbrication
-            before = text
-            text = re.sub(
-                r'\{\{(?:[^{}])*?\}\}',
-                self._protect_zone,
-                text
-            )
-            if text == before:
-                break
-        
-        # 4. Protéger liens internes [[...]]
-        # On protège aussi de l'intérieur vers l'extérieur
-        for _ in range(max_iterations):
-            before = text
-            text = re.sub(
-                r'\[\[(?:[^\[\]])*?\]\]',
-                self._protect_zone,
-                text
-            )
-            if text == before:
-                break
-        
-        # 5. Protéger liens externes [http...]
-        text = re.sub(
-            r'\[(?:https?|ftp)://[^\]]+\]',
-            self._protect_zone,
-            text
-        )
-        
-        # 6. Protéger URLs nues
-        text = re.sub(
-            r'(?:https?|ftp)://[^\s<>"{}|\\^\[\]`]+',
-            self._protect_zone,
-            text
-        )
-        
-        # 7. Protéger galeries
-        text = re.sub(
-            r'<gallery[^>]*>.*?</gallery>',
-            self._protect_zone,
-            text,
-            flags=re.DOTALL | re.IGNORECASE
-        )
-        
-        # 8. Protéger tableaux wiki {| ... |}
-        text = re.sub(
-            r'\{\|.*?\|\}',
-            self._protect_zone,
-            text,
-            flags=re.DOTALL
-        )
+        def protect(zone):
+            zones.append(zone)
+            return f"\x00{len(zones) - 1}\x00"
+        
+        # 1. Protéger balises, galeries, liens externes, URLs et tableaux
+        text = _PROTECTED_ZONE_RE.sub(lambda match: protect(match.group(0)), text)
+        
+        # 2. Protéger modèles (imbriqués)
+        text = self._protect_nested(text, _TEMPLATE_TOKEN_RE, protect)
+        
+        # 3. Protéger liens internes [[...]]
+        text = self._protect_nested(text, _LINK_TOKEN_RE, protect)
         
         return text
     
-    def _verify_no_protected_zones_modified(self, original: str, corrected: str) -> bool:
+    def _verify_no_protected_zones_modified(self, zones: List[str], corrected: str) -> bool:
         """
         Vérifie qu'aucune zone protégée n'a été modifiée
         
         Returns:
             True si tout est OK, False si une zone protégée a changé
         """
-        for key, original_content in self.protected_zones.items():
-            if key in corrected:
-                # La clé est toujours là, bon signe
-                continue
-            else:
+        # Un seul parcours du texte, quel que soit le nombre de zones
+        present = {int(match.group(1)) for match in _PLACEHOLDER_RE.finditer(corrected)}
+        for index, original_content in enumerate(zones):
+            if index not in present:
                 # La clé a disparu, GRAVE PROBLÈME
                 logger.error(f"Zone protégée modifiée ou perdue: {original_content[:50]}")
                 return False
@@ -159,24 +223,34 @@ class SafeTypoFixer:
             return text
         
         # Réinitialiser
-        self.protected_zones = {}
-        self.protection_counter = 0
         self.changes_made = []
         
+        # Rien à corriger : éviter protection, corrections et restauration
+        if (
+            not any(char in text for char in _HAZARD_CHARS)
+            and not _NEEDS_SPACING_WORK_RE.search(text)
+        ):
+            return text
+        
         original_text = text
         
         try:
             # ÉTAPE 1 : PROTECTION
-            text = self._protect_all_sensitive_zones(text)
+            # (zones locales à l'appel : fix peut être appelé en parallèle)
+            zones = []
+            text = self._protect_all_sensitive_zones(text, zones)
             
             # ÉTAPE 2 : CORRECTIONS (sur texte protégé)
-            text = self._apply_corrections(text)
+            text, changed = self._apply_corrections(text)
+            if not changed:
+                # Aucune correction : rien à restaurer ni à vérifier
+                return original_text
             
             # ÉTAPE 3 : RESTAURATION
-            text = self._restore_zones(text)
+            text = self._restore_zones(text, zones)
             
             # ÉTAPE 4 : VÉRIFICATION FINALE
-            if not self._verify_no_protected_zones_modified(original_text, text):
+            if not self._verify_no_protected_zones_modified(zones, text):
                 logger.warning("⚠️ Zones protégées modifiées - ANNULATION des corrections")
                 return original_text
             
@@ -199,49 +273,55 @@ class SafeTypoFixer:
             # En cas d'erreur, TOUJOURS retourner l'original
             return original_text
     
-    def _apply_corrections(self, text: str) -> str:
-        """Applique les corrections sur le texte protégé"""
+    def _apply_corrections(self, text: str) -> Tuple[str, bool]:
+        """
+        Applique les corrections sur le texte protégé
+        
+        Returns:
+            (texte corrigé, True si au moins une correction a modifié le texte)
+        """
+        protected_text = text
         
         # 1. Apostrophes typographiques
-        text = re.sub(r"\s*'\s*", "'", text)
-        text = re.sub(r"`", "'", text)
+        text = _APOSTROPHE_SPACES_RE.sub("'", text)
+        text = text.replace("`", "'")
         
         # 2. Guillemets français
         # Ouvrant
-        text = re.sub(r'«\s*', '« ', text)
+        text = _QUOTE_OPEN_RE.sub('« ', text)
         # Fermant
-        text = re.sub(r'\s*»', ' »', text)
+        text = _QUOTE_CLOSE_RE.sub(' »', text)
         # Pas plus de 2 espaces
-        text = re.sub(r'«\s{2,}', '« ', text)
-        text = re.sub(r'\s{2,}»', ' »', text)
+        text = _QUOTE_OPEN_SPACES_RE.sub('« ', text)
+        text = _QUOTE_CLOSE_SPACES_RE.sub(' »', text)
         
         # 3. Parenthèses
         # Supprimer espaces internes
-        text = re.sub(r'\(\s+', '(', text)
-        text = re.sub(r'\s+\)', ')', text)
+        text = _PAREN_OPEN_SPACES_RE.sub('(', text)
+        text = _PAREN_CLOSE_SPACES_RE.sub(')', text)
         # Ajouter espace avant (si manquant)
-        text = re.sub(r'([^\s\(])\(', r'\1 (', text)
+        text = _PAREN_SPACE_BEFORE_RE.sub(r'\1 (', text)
         # Ajouter espace après (si manquant)
-        text = re.sub(r'\)([^\s\)\.,;:!?\-])', r') \1', text)
+        text = _PAREN_SPACE_AFTER_RE.sub(r') \1', text)
         
         # 4. Ponctuation basse : point et virgule
         # Supprimer espace avant
-        text = re.sub(r'\s+([.,])', r'\1', text)
+        text = _LOW_PUNCT_SPACE_BEFORE_RE.sub(r'\1', text)
         # Ajouter espace après (sauf si chiffre suit pour nombres décimaux)
-        text = re.sub(r'([.,])([^\s\d])', r'\1 \2', text)
+        text = _LOW_PUNCT_SPACE_AFTER_RE.sub(r'\1 \2', text)
         
         # 5. Ponctuation haute : ; : ! ?
         # Espace insécable avant (simulé par espace simple ici)
         # Espace normal après
-        text = re.sub(r'\s*([;:!?])\s*', r' \1 ', text)
+        text = _HIGH_PUNCT_RE.sub(r' \1 ', text)
         
         # 6. Points de suspension
-        text = re.sub(r'\.\s*\.\s*\.+', '...', text)
-        text = re.sub(r'\.{4,}', '...', text)
+        text = _ELLIPSIS_RE.sub('...', text)
+        text = _LONG_ELLIPSIS_RE.sub('...', text)
         
         # 7. Tirets cadratins (pour incises)
         # Attention : ne pas toucher aux listes à puces
-        text = re.sub(r'([^\n\-])\s+-\s+', r'\1 — ', text)
+        text = _DASH_RE.sub(r'\1 — ', text)
         
         # 8. Majuscules début de phrase
         def capitalize_sentence(match):
@@ -252,23 +332,18 @@ class SafeTypoFixer:
                     return match.group(0)
             return prev + char.upper()
         
-        text = re.sub(
-            r'(^|[.!?]\s+)([a-zàâçéèêëîïôûùüÿñæœ])',
-            capitalize_sentence,
-            text,
-            flags=re.MULTILINE
-        )
+        text = _SENTENCE_START_RE.sub(capitalize_sentence, text)
         
         # 9. Espaces multiples
-        text = re.sub(r'[ \t]{2,}', ' ', text)
+        text = _MULTIPLE_SPACES_RE.sub(' ', text)
         
         # 10. Espaces en fin de ligne
-        text = re.sub(r'[ \t]+$', '', text, flags=re.MULTILINE)
+        text = _TRAILING_SPACES_RE.sub('', text)
         
         # 11. Lignes vides multiples (max 2)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _BLANK_LINES_RE.sub('\n\n', text)
         
-        return text
+        return text, text != protected_text
     
     def get_summary(self, before: str, after: str) -> str:
         """
@@ -290,19 +365,19 @@ class SafeTypoFixer:
         if '«' in before or '»' in before:
             changes.append("guillemets")
         
-        if re.search(r'[!?;:]', before):
+        if _HIGH_PUNCT_CHAR_RE.search(before):
             changes.append("ponct. haute")
         
-        if '(' in before and re.search(r'\(\s|\s\)', before):
+        if '(' in before and _PAREN_SPACES_RE.search(before):
             changes.append("parenthèses")
         
-        if re.search(r'\.\s*\.\s*\.', before):
+        if _SPACED_ELLIPSIS_RE.search(before):
             changes.append("ellipses")
         
-        if re.search(r"[''`]", before):
+        if _APOSTROPHE_CHAR_RE.search(before):
             changes.append("apostrophes")
         
-        if re.search(r'\s+[.,;]', before):
+        if _SPACE_BEFORE_PUNCT_RE.search(before):
             changes.append("espaces")
         
         if not changes:
@@ -313,17 +388,19 @@ class SafeTypoFixer:
         return f"Typo : {', '.join(changes)}"
 
 
+# Instance partagée par les helpers
+_default_fixer = SafeTypoFixer()
+
+
 # Fonction helper pour compatibilité
 def fix_typo(text: str) -> str:
     """Helper pour corrections rapides"""
-    fixer = SafeTypoFixer()
-    return fixer.fix(text)
+    return _default_fixer.fix(text)
 
 
 def typo_summary(before: str, after: str) -> str:
     """Helper pour résumé"""
-    fixer = SafeTypoFixer()
-    return fixer.get_summary(before, after)
+    return _default_fixer.get_summary(before, after)
 
 
 # Alias pour compatibilité avec ancien code
@@ -4,6 +4,7 @@
 import os
 import sys
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import requests
 
@@ -27,6 +28,7 @@ BOT_USERNAME = "BotCélian"
 PDD_TITLE = f"Discussion utilisateur:{BOT_USERNAME}"
 LOG_PAGE_TITLE = f"Utilisateur:{BOT_USERNAME}/Logs/2025"
 HASH_FILE = "/home/celian/.pdd_hash"
+HASH_CHUNK_CHARS = 1 << 16
 
 # ---------------- SITE ----------------
 site = pywikibot.Site("fr", "vikidia")
@@ -43,18 +45,42 @@ def save_hash(h):
     with open(HASH_FILE, "w") as f:
         f.write(h)
 
+def text_hash(text):
+    # SHA-256 du texte UTF-8, encodé par morceaux (pas de copie complète en bytes)
+    h = hashlib.sha256()
+    for start in range(0, len(text), HASH_CHUNK_CHARS):
+        h.update(text[start:start + HASH_CHUNK_CHARS].encode("utf-8"))
+    return h.hexdigest()
+
 def get_page_hash(page_title):
     page = pywikibot.Page(site, page_title)
-    return hashlib.sha256(page.text.encode("utf-8")).hexdigest()
+    return text_hash(page.text)
 
 # ---------------- PDD ----------------
+def fetch_last_revision(page_title):
+    # Auteur et contenu de la dernière révision en une seule requête API
+    data = site.simple_request(
+        action="query",
+        prop="revisions",
+        titles=page_title,
+        rvprop="user|content",
+        rvslots="main",
+        rvlimit=1,
+    ).submit()
+    pages = data["query"]["pages"]
+    page = pages[0] if isinstance(pages, list) else next(iter(pages.values()))
+    if "missing" in page or not page.get("revisions"):
+        return None, None
+    revision = page["revisions"][0]
+    slot = revision["slots"]["main"]
+    return revision["user"], slot.get("content", slot.get("*", ""))
+
 def get_last_user():
     try:
-        page = pywikibot.Page(site, PDD_TITLE)
-        if not page.exists():
+        user, text = fetch_last_revision(PDD_TITLE)
+        if user is None:
             return None, None
-        last_rev = next(page.revisions(total=1))
-        return last_rev.user, hashlib.sha256(page.text.encode("utf-8")).hexdigest()
+        return user, text_hash(text)
     except Exception as e:
         print(f"Erreur en vérifiant la PDD : {e}")
         return None, None
@@ -107,6 +133,23 @@ def send_discord_embed(user):
     except Exception as e:
         print(f"Erreur en envoyant l'embed Discord : {e}")
 
+# ---------------- SHUTDOWN ----------------
+def run_shutdown_tasks(user, current_hash):
+    # Les éditions wiki restent séquentielles (même session pywikibot),
+    # mais tournent en parallèle du webhook Discord et de l'écriture du hash
+    def wiki_edits():
+        reply_on_pdd(user)
+        log_shutdown_event(user)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(wiki_edits),
+            executor.submit(send_discord_embed, user),
+            executor.submit(save_hash, current_hash),
+        ]
+        for future in futures:
+            future.result()
+
 # ---------------- MAIN ----------------
 def main():
     print("Vérification PDD pour arrêt demandé...")
@@ -118,10 +161,7 @@ def main():
     last_hash = read_last_hash()
     if last_hash != current_hash:
         print(f"Arrêt demandé par {user}. Exécution du shutdown...")
-        reply_on_pdd(user)
-        save_hash(current_hash)
-        log_shutdown_event(user)
-        send_discord_embed(user)
+        run_shutdown_tasks(user, current_hash)
         os.system("sudo shutdown -h now")
     else:
         print("Aucune modification de la PDD détectée. Tout va bien.")
@@ -1,156 +1,319 @@
+import os
 import pywikibot
+import shelve
+import threading
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-site = pywikibot.Site()
-site.login()
+# Prochain bloc à ignorer, reconnu en entier quand il n'est pas imbriqué
+_BLOCK_RE = re.compile(
+    # Commentaire HTML : jusqu'à la fin du texte (l'ancien scanner ne
+    # reconnaissait jamais '-->', le découpage est conservé)
+    r'<!--[\s\S]*'
+    # Modèle {{ }} sans {{ intérieur
+    r'|\{\{(?:[^{}]|\{(?!\{)|\}(?!\}))*(?:\}\}|\Z)'
+    # Tableau {| |} sans {| intérieur
+    r'|\{\|(?:[^{|]|\{(?!\|)|\|(?!\}))*(?:\|\}|\Z)'
+    # [ ] simple (pas [[ ]])
+    r'|\[(?!\[)[^\]]*(?:\]|\Z)'
+    # Modèle ou tableau imbriqué : fin trouvée par skip_nested
+    r'|(?P<nested>\{\{|\{\|)'
+)
 
-since = datetime.utcnow() - timedelta(days=7)
+# Tout ce qui peut déclencher une correction dans fix_typos_segment, y compris
+# un début de segment (après }}, |} ou ]) qui passerait en majuscule
+_TYPO_TRIGGER_RE = re.compile(
+    r'[«»!?]|\s\.|\.\s+[a-z]|(?i:\[\[\s*File\s*:)'
+    r'|(?:\}\}|\|\}|\])(?:[^\W\d_]|[\u0345\u24d0-\u24e9])'
+)
+
+# Motifs de fix_typos_segment, compilés une seule fois
+_FILE_LINK_RE = re.compile(r"\[\[\s*File\s*:", re.I)
+_HIGH_PUNCT_RE = re.compile(r'([^\s])([!?])')
+# Pas de groupes : la ponctuation et les espaces ne changent pas en majuscules,
+# la correspondance entière peut donc passer par str.upper
+_SENTENCE_START_RE = re.compile(r'[.!?]\s+[a-z]')
+
+# Dernière révision traitée par page (pageid → revid), gardée entre les exécutions
+SEEN_REVS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seen_revs")
+
+# Variation de taille minimale (octets) pour qu'une modification soit examinée
+MIN_SIZE_DELTA = 50
+
+def skip_nested(text, i, opener, closer):
+    """
+    Position juste après le bloc ouvert en i (opener … closer, imbrications
+    comprises), ou fin du texte si le bloc n'est jamais refermé
+    Saute d'un délimiteur au suivant avec str.find
+    """
+    depth = 1
+    i += 2
+    close = text.find(closer, i)
+    while close >= 0:
+        # Un opener qui commence avant le closer passe en premier, même s'il
+        # le chevauche ("{|}")
+        open_at = text.find(opener, i, close + 1)
+        if open_at >= 0:
+            depth += 1
+            i = open_at + 2
+            if close < i:
+                close = text.find(closer, i)
+        else:
+            depth -= 1
+            i = close + 2
+            if not depth:
+                return i
+            close = text.find(closer, i)
+    return len(text)
 
 def split_text_ignoring_blocks(text):
     """
     Sépare le texte en segments :
     - à traiter (hors {{ }}, {| |}, <!-- -->, [ ])
     - à ignorer (dans ces blocs)
-    Retourne une liste de tuples : (segment, à_corriger: True/False)
+    Retourne deux listes parallèles : segments et à_corriger (True/False)
     """
     segments = []
+    to_fix = []
     i = 0
     n = len(text)
     while i < n:
-        # Bloc à ignorer : commentaire HTML
-        if text[i:i+4] == '<!--':
-            start = i
-            i += 4
-            while i < n and text[i-3:i+1] != '-->':
-                i +=1
-            segments.append((text[start:i], False))
-            i +=1
-        # Bloc à ignorer : modèle {{ }}
-        elif text[i:i+2] == '{{':
-            start = i
-            depth = 2
-            i += 2
-            while i < n and depth > 0:
-                if text[i:i+2] == '{{':
-                    depth += 2
-                    i +=2
-                elif text[i:i+2] == '}}':
-                    depth -=2
-                    i +=2
-                else:
-                    i +=1
-            segments.append((text[start:i], False))
-        # Bloc à ignorer : tableau {| |}
-        elif text[i:i+2] == '{|':
-            start = i
-            depth = 2
-            i += 2
-            while i < n and depth > 0:
-                if text[i:i+2] == '{|':
-                    depth +=2
-                    i +=2
-                elif text[i:i+2] == '|}':
-                    depth -=2
-                    i +=2
-                else:
-                    i +=1
-            segments.append((text[start:i], False))
-        # Bloc à ignorer : [ ] simples (pas [[ ]]
-        elif text[i] == '[' and (i+1 >= n or text[i+1] != '['):
-            start = i
-            i +=1
-            while i < n and text[i] != ']':
-                i +=1
-            i +=1
-            segments.append((text[start:i], False))
+        block = _BLOCK_RE.search(text, i)
+        if not block:
+            # segment à corriger jusqu'à la fin
+            segments.append(text[i:])
+            to_fix.append(True)
+            break
+
+        start = block.start()
+        if start > i:
+            # segment à corriger avant le bloc
+            segments.append(text[i:start])
+            to_fix.append(True)
+
+        opener = block.group('nested')
+        if opener:
+            i = skip_nested(text, start, opener, '}}' if opener == '{{' else '|}')
         else:
-            # segment à corriger
-            start = i
-            while i < n:
-                if text[i:i+2] in ('{{','{|') or text[i:i+4] == '<!--':
-                    break
-                elif text[i] == '[' and (i+1 >= n or text[i+1] != '['):
-                    break
-                else:
-                    i +=1
-            segments.append((text[start:i], True))
-    return segments
+            i = block.end()
+        segments.append(text[start:i])
+        to_fix.append(False)
+    return segments, to_fix
+
+def fix_guillemets(text):
+    """
+    «…» → {{"|…}} (espaces intérieurs retirés), « et » isolés supprimés
+    """
+    parts = []
+    pos = 0
+    while True:
+        start = text.find('«', pos)
+        if start < 0:
+            break
+        end = text.find('»', start + 1)
+        if end < 0:
+            break
+        parts.append(text[pos:start].replace('»', ''))
+        inner = text[start + 1:end].strip()
+        if '\n' in inner:
+            # Pas de modèle sur plusieurs lignes : seul ce « est supprimé
+            pos = start + 1
+            continue
+        parts.append('{{"|' + inner.replace('«', '') + '}}')
+        pos = end + 1
+    parts.append(text[pos:].replace('«', '').replace('»', ''))
+    return "".join(parts)
+
+def strip_spaces_before_dots(text):
+    """
+    Équivalent de re.sub(r'\s+\.', '.', text) : str.rstrip retire les mêmes
+    espaces (Unicode) que \s, sans passer par le moteur de regex
+    """
+    parts = text.split('.')
+    last = parts.pop()
+    return '.'.join([part.rstrip() for part in parts] + [last])
+
+def upper_match(match):
+    return match.group(0).upper()
 
 def fix_typos_segment(text):
     """
     Applique les corrections sur un segment à corriger
     """
-    original = text
+    # Chaque passe signale ses propres changements ; aucune ne défait ce
+    # qu'une précédente a modifié, pas besoin de comparer au texte d'origine
 
     # [[File: → [[Fichier:
-    text = re.sub(r"\[\[\s*File\s*:", "[[Fichier:", text, flags=re.I)
+    text, count = _FILE_LINK_RE.subn("[[Fichier:", text)
+    changed = count > 0
 
     # Modèles avec guillemets typographiques «…» → {{"|…}}
-    text = re.sub(r"«\s*(.*?)\s*»", r'{{"|\1}}', text)
-    text = text.replace('«', '').replace('»', '')
+    if '«' in text or '»' in text:
+        # chaque « ou » est converti ou supprimé
+        text = fix_guillemets(text)
+        changed = True
 
     # Pas d'espaces avant le point
-    text = re.sub(r'\s+\.', '.', text)
+    if '.' in text:
+        length = len(text)
+        text = strip_spaces_before_dots(text)
+        changed = changed or len(text) != length
 
     # Ajouter un espace avant ! et ?
-    text = re.sub(r'([^\s])([!?])', r'\1 \2', text)
+    text, count = _HIGH_PUNCT_RE.subn(r'\1 \2', text)
+    changed = changed or count > 0
 
     # Majuscule après point, ! ou ? suivi d'espace
-    def capitalize(match):
-        return match.group(1) + match.group(2).upper()
-    text = re.sub(r'([.!?]\s+)([a-z])', capitalize, text)
+    text, count = _SENTENCE_START_RE.subn(upper_match, text)
+    changed = changed or count > 0
 
     # Majuscule au début du texte
-    if text:
-        text = text[:1].upper() + text[1:]
+    first = text[:1]
+    if first.upper() != first:
+        text = first.upper() + text[1:]
+        changed = True
 
-    return text, text != original
+    return text, changed
 
 def fix_typos_ignoring_blocks(text):
-    segments = split_text_ignoring_blocks(text)
-    new_text = ''
+    # Aucun déclencheur : aucun segment ne serait modifié
+    if text[:1].upper() == text[:1] and not _TYPO_TRIGGER_RE.search(text):
+        return text, False
+    # Aucun bloc à ignorer : le texte entier forme un seul segment
+    if not any(marker in text for marker in ('{{', '{|', '<!--', '[')):
+        return fix_typos_segment(text)
+    segments, to_fix = split_text_ignoring_blocks(text)
     changed = False
-    for seg, to_fix in segments:
-        if to_fix:
-            fixed, ch = fix_typos_segment(seg)
-            new_text += fixed
+    # Seuls les segments à corriger sont remplacés, sur place
+    for index, fix in enumerate(to_fix):
+        if fix:
+            segments[index], ch = fix_typos_segment(segments[index])
             changed = changed or ch
-        else:
-            new_text += seg
-    return new_text, changed
+    return "".join(segments), changed
 
-pages_done = set()
+def preload_pages(site, titles, groupsize=50):
+    """
+    Pages préchargées par lots de groupsize (une requête API par lot)
+    Le lot suivant est chargé en arrière-plan pendant le traitement du lot
+    courant (corrections et modifications, qui restent séquentielles)
+    Un lot dont le chargement échoue est signalé puis sauté
+    """
+    def load(chunk):
+        pages = [pywikibot.Page(site, title) for title in chunk]
+        return list(site.preloadpages(pages, groupsize=groupsize))
 
-for rc in site.recentchanges(
-    namespaces=[0],
-    changetype="edit",
-    start=since,
-    reverse=True
-):
-    title = rc["title"]
-    if title in pages_done:
-        continue
-    pages_done.add(title)
+    chunks = [titles[i:i + groupsize] for i in range(0, len(titles), groupsize)]
+    if not chunks:
+        return
 
-    page = pywikibot.Page(site, title)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(load, chunks[0])
+        for number, next_chunk in enumerate(chunks[1:] + [None], start=1):
+            current = future
+            if next_chunk is not None:
+                future = executor.submit(load, next_chunk)
+            try:
+                pages = current.result()
+            except Exception as e:
+                print(f"❌ erreur de chargement du lot {number} : {e}")
+                time.sleep(1)
+                continue
+            yield from pages
 
+def save_correction(page, new_text, pageid, revid, seen, seen_lock):
+    """
+    Enregistre la correction (appelé dans le thread d'écriture)
+    revid est la révision vue dans les modifications récentes
+    """
+    title = page.title()
     try:
-        text = page.get()
-        new_text, changed = fix_typos_ignoring_blocks(text)
-
-        if not changed:
-            continue
-
         page.put(
             new_text,
             summary="Corrections typographiques",
             minor=True
         )
+        # Révision des modifications récentes, pas celle de la correction :
+        # avec bot=False, celle-ci n'y apparaît pas si le compte a le statut
+        # de bot, et sinon elle est revue une fois sans rien à corriger
+        with seen_lock:
+            seen[pageid] = revid
         print(f"✔ corrigé : {title}")
-        time.sleep(1)
-
     except Exception as e:
         print(f"❌ erreur sur {title} : {e}")
-        time.sleep(1)
+    time.sleep(1)
+
+def main():
+    site = pywikibot.Site()
+    site.login()
+
+    since = datetime.utcnow() - timedelta(days=7)
+
+    # Dernière révision de chaque page modifiée (titre → (pageid, revid))
+    latest_revs = {}
+
+    for rc in site.recentchanges(
+        namespaces=[0],
+        changetype="edit",
+        bot=False,
+        start=since,
+        reverse=True
+    ):
+        title = rc["title"]
+        # Page retenue dès qu'une modification dépasse MIN_SIZE_DELTA ;
+        # ensuite toutes ses modifications mettent à jour la révision
+        if title in latest_revs or abs(rc["newlen"] - rc["oldlen"]) >= MIN_SIZE_DELTA:
+            latest_revs[title] = (str(rc["pageid"]), rc["revid"])
+
+    with shelve.open(SEEN_REVS_FILE) as seen:
+        seen_lock = threading.Lock()
+
+        # Pages inchangées depuis leur dernier traitement : ignorées
+        titles = [
+            title for title, (pageid, revid) in latest_revs.items()
+            if seen.get(pageid) != revid
+        ]
+
+        # Un seul thread d'écriture : les modifications restent séquentielles
+        # (throttle pywikibot + pause), mais le chargement et les corrections
+        # des pages suivantes continuent pendant ce temps
+        writer = ThreadPoolExecutor(max_workers=1)
+
+        # Noms utilisés à chaque page, liés une fois en variables locales
+        fix = fix_typos_ignoring_blocks
+        submit = writer.submit
+
+        try:
+            for page in preload_pages(site, titles):
+                title = page.title()
+
+                try:
+                    pageid, revid = latest_revs[title]
+                    # Texte déjà préchargé : pas de requête, mais get() lève toujours
+                    # les erreurs de page (redirection, page inexistante)
+                    text = page.get()
+                    new_text, changed = fix(text)
+
+                    if not changed:
+                        with seen_lock:
+                            seen[pageid] = revid
+                        continue
+
+                    submit(save_correction, page, new_text, pageid, revid, seen, seen_lock)
+
+                except Exception as e:
+                    print(f"❌ erreur sur {title} : {e}")
+                    time.sleep(1)
+
+        except BaseException:
+            # Interruption (Ctrl-C, erreur) : les corrections en attente sont
+            # abandonnées, seule celle en cours se termine avant la fermeture
+            writer.shutdown(wait=True, cancel_futures=True)
+            raise
+
+        # Attendre les dernières modifications avant de fermer le fichier
+        writer.shutdown(wait=True)
+
+if __name__ == "__main__":
+    main()